@@ -0,0 +1,88 @@
+import mineflayer from 'mineflayer';
+
+// Entities further than this from the bot are reported as removed
+const FEED_RADIUS = 64;
+// Removals kept for clients polling with an older cursor; older cursors get a full snapshot
+const REMOVED_LOG_SIZE = 1000;
+// Smaller moves (blocks) are not reported as changes
+const MOVE_EPSILON = 0.1;
+
+interface FeedEntity {
+    id: number;
+    name: string;
+    type: string;
+    position: { x: number; y: number; z: number };
+}
+
+interface TrackedEntity extends FeedEntity {
+    version: number;
+}
+
+const round = (value: number) => Math.round(value * 100) / 100;
+
+/**
+ * Versioned view of the entities around the bot, so pollers only receive what changed
+ * since their cursor instead of a full snapshot on every poll.
+ */
+export class EntityFeed {
+    private version = 0;
+    private tracked = new Map<number, TrackedEntity>();
+    private removed: { id: number; version: number }[] = [];
+    private oldestCursor = 0;
+
+    private refresh(bot: mineflayer.Bot): void {
+        const origin = bot.entity.position;
+        const seen = new Set<number>();
+
+        for (const entity of Object.values(bot.entities)) {
+            if (entity === bot.entity || !entity.position || entity.position.distanceTo(origin) > FEED_RADIUS) {
+                continue;
+            }
+            seen.add(entity.id);
+            const pos = entity.position;
+            const previous = this.tracked.get(entity.id);
+            if (previous
+                && Math.abs(previous.position.x - pos.x) < MOVE_EPSILON
+                && Math.abs(previous.position.y - pos.y) < MOVE_EPSILON
+                && Math.abs(previous.position.z - pos.z) < MOVE_EPSILON) {
+                continue;
+            }
+            this.tracked.set(entity.id, {
+                id: entity.id,
+                name: entity.username ?? entity.name ?? 'unknown',
+                type: entity.type === 'player' ? 'player' : entity.name ?? 'unknown',
+                position: { x: round(pos.x), y: round(pos.y), z: round(pos.z) },
+                version: ++this.version
+            });
+        }
+
+        for (const id of [...this.tracked.keys()]) {
+            if (!seen.has(id)) {
+                this.tracked.delete(id);
+                this.removed.push({ id, version: ++this.version });
+            }
+        }
+
+        if (this.removed.length > REMOVED_LOG_SIZE) {
+            const dropped = this.removed.splice(0, this.removed.length - REMOVED_LOG_SIZE);
+            this.oldestCursor = dropped[dropped.length - 1].version;
+        }
+    }
+
+    public poll(bot: mineflayer.Bot, since?: number) {
+        this.refresh(bot);
+        const strip = ({ version, ...entity }: TrackedEntity): FeedEntity => entity;
+        const entities = [...this.tracked.values()];
+
+        // No cursor, one from before a restart, or one whose removals were already dropped
+        if (since === undefined || Number.isNaN(since) || since < this.oldestCursor || since > this.version) {
+            return { full: true, cursor: this.version, entities: entities.map(strip) };
+        }
+        return {
+            full: false,
+            cursor: this.version,
+            entities: entities.filter(entity => entity.version > since).map(strip),
+            removed: this.removed.filter(entry => entry.version > since).map(entry => entry.id)
+        };
+    }
+}
@@ -2,6 +2,7 @@ import mineflayer from 'mineflayer';
 import { pathfinder, goals } from 'mineflayer-pathfinder';
 import { BotConfig, BotStatus } from '../types';
 import { setupBotEvents } from './events';
+import { EntityFeed } from './entities';
 import { Block } from 'prismarine-block';
 
 class MinecraftBot {
@@ -14,6 +15,7 @@ class MinecraftBot {
     private reconnectAttempts = 0;
     private maxReconnectAttempts = 5;
     private isReconnecting = false;
+    private entityFeed = new EntityFeed();
 
     constructor(config: BotConfig) {
         this.config = config;
@@ -186,6 +188,18 @@ class MinecraftBot {
         return 'Bot movement stopped';
     }
 
+    public stopMining(): string {
+        if (!this.isReady() || !this.bot) {
+            throw new Error('Bot is not ready');
+        }
+
+        // Dropping the goal makes a pending mine() fail before it digs
+        this.bot.pathfinder.setGoal(null);
+        this.bot.stopDigging();
+
+        return 'Bot mining stopped';
+    }
+
     public getPosition() {
         if (!this.isReady() || !this.bot) {
             throw new Error('Bot is not ready');
@@ -328,6 +342,91 @@ class MinecraftBot {
         }
     }
 
+    private furnaceBlockIds(): number[] {
+        const blocks = this.bot!.registry.blocksByName;
+        return ['furnace', 'blast_furnace', 'smoker']
+            .filter(name => blocks[name])
+            .map(name => blocks[name].id);
+    }
+
+    public findFurnaces(maxDistance = 16) {
+        if (!this.isReady() || !this.bot) {
+            throw new Error('Bot is not ready');
+        }
+
+        const positions = this.bot.findBlocks({
+            matching: this.furnaceBlockIds(),
+            maxDistance,
+            count: 64
+        });
+        return positions.map(pos => ({
+            type: this.bot!.blockAt(pos)?.name ?? 'furnace',
+            position: { x: pos.x, y: pos.y, z: pos.z }
+        }));
+    }
+
+    private async openFurnaceAt(x: number, y: number, z: number) {
+        const block = this.bot!.blockAt(this.bot!.entity.position.clone().set(x, y, z));
+        if (!block || !this.furnaceBlockIds().includes(block.type)) {
+            throw new Error(`No furnace at (${x}, ${y}, ${z})`);
+        }
+
+        await this.bot!.pathfinder.goto(new goals.GoalNear(x, y, z, 2));
+        return this.bot!.openFurnace(block);
+    }
+
+    public async loadFurnace(x: number, y: number, z: number, itemType: string, count: number, fuelType: string, fuelCount: number) {
+        if (!this.isReady() || !this.bot) {
+            throw new Error('Bot is not ready');
+        }
+
+        const item = this.bot.registry.itemsByName[itemType];
+        const fuel = this.bot.registry.itemsByName[fuelType];
+        if (!item || !fuel) {
+            throw new Error(`Unknown item "${!item ? itemType : fuelType}"`);
+        }
+
+        const loaded = Math.min(count, this.bot.inventory.count(item.id, null));
+        if (loaded === 0) {
+            throw new Error(`No ${itemType} in inventory`);
+        }
+        const fuelLoaded = Math.min(fuelCount, this.bot.inventory.count(fuel.id, null));
+
+        const furnace = await this.openFurnaceAt(x, y, z);
+        try {
+            if (fuelLoaded > 0) {
+                await furnace.putFuel(fuel.id, null, fuelLoaded);
+            }
+            await furnace.putInput(item.id, null, loaded);
+        } finally {
+            furnace.close();
+        }
+
+        return { loaded, fuelLoaded };
+    }
+
+    public async collectFurnace(x: number, y: number, z: number) {
+        if (!this.isReady() || !this.bot) {
+            throw new Error('Bot is not ready');
+        }
+
+        const furnace = await this.openFurnaceAt(x, y, z);
+        try {
+            const output = furnace.outputItem();
+            if (output) {
+                await furnace.takeOutput();
+            }
+            return {
+                item: output?.name ?? null,
+                collected: output?.count ?? 0,
+                remaining: furnace.inputItem()?.count ?? 0,
+                fuelLeft: furnace.fuelItem()?.count ?? 0
+            };
+        } finally {
+            furnace.close();
+        }
+    }
+
     public dropItem(itemName: string, count = 1): string {
         if (!this.isReady() || !this.bot) {
             throw new Error('Bot is not ready');
@@ -362,6 +461,13 @@ class MinecraftBot {
         return `Looking at ${playerName}`;
     }
 
+    public getNearbyEntities(since?: number) {
+        if (!this.isReady() || !this.bot) {
+            throw new Error('Bot is not ready');
+        }
+        return this.entityFeed.poll(this.bot, since);
+    }
+
     public getInventory() {
         if (!this.isReady() || !this.bot) {
             throw new Error('Bot is not ready');
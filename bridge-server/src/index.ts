@@ -1,9 +1,12 @@
 import dotenv from 'dotenv';
+import fs from 'fs';
 import express from 'express';
 import cors from 'cors';
 import MinecraftBot from './bot';
 import { setupRoutes } from './routes';
 import { errorHandler, notFoundHandler } from './middleware/error';
+import { compressResponses } from './middleware/compression';
+import { msgpackResponses, parseMsgpack } from './middleware/msgpack';
 import { BotConfig } from './types';
 
 // Load environment variables
@@ -20,6 +23,8 @@ const botConfig: BotConfig = {
 
 // Server configuration
 const serverPort = parseInt(process.env.PORT || '3001');
+// When set, listen on this UNIX domain socket instead of the TCP port (co-located MCP server)
+const socketPath = process.env.SOCKET_PATH;
 
 // Create Express app
 const app = express();
@@ -27,6 +32,11 @@ const app = express();
 // Middleware
 app.use(cors());
 app.use(express.json());
+app.use(parseMsgpack());
+// gzip/deflate/br for larger responses when the client asks (Accept-Encoding)
+app.use(compressResponses());
+// MessagePack responses when the client prefers them (Accept)
+app.use(msgpackResponses());
 
 // Create bot instance
 console.log('🚀 Starting Minecraft Bot Bridge Server...');
@@ -42,9 +52,15 @@ app.use('*', notFoundHandler);
 app.use(errorHandler);
 
 // Start server
-app.listen(serverPort, () => {
-    console.log(`🌐 Bridge server running on http://localhost:${serverPort}`);
-    console.log(`🩺 Health check: http://localhost:${serverPort}/health`);
+if (socketPath && fs.existsSync(socketPath)) {
+    // Remove the stale socket left by a previous run
+    fs.unlinkSync(socketPath);
+}
+
+app.listen(socketPath || serverPort, () => {
+    const target = socketPath ? `unix://${socketPath}` : `http://localhost:${serverPort}`;
+    console.log(`🌐 Bridge server running on ${target}`);
+    console.log(`🩺 Health check: ${target}/health`);
     console.log('📋 Available endpoints:');
     console.log('  GET  /health             - Server and bot status');
     console.log('  GET  /bot/status         - Detailed bot information');
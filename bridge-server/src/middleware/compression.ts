@@ -0,0 +1,41 @@
+import { Request, Response, NextFunction } from 'express';
+import zlib from 'zlib';
+
+// Small bodies are not worth the CPU, nor the header bytes
+const MIN_COMPRESS_BYTES = 1024;
+
+type Encoding = 'br' | 'gzip' | 'deflate';
+
+function pickEncoding(header: string | undefined): Encoding | null {
+    if (!header) return null;
+    const offered = header.split(',')
+        .map(part => part.trim().split(';'))
+        .filter(([, q]) => !q || parseFloat(q.trim().replace('q=', '')) > 0)
+        .map(([name]) => name.toLowerCase());
+    return (['br', 'gzip', 'deflate'] as Encoding[]).find(encoding => offered.includes(encoding)) ?? null;
+}
+
+export function compressResponses() {
+    return (req: Request, res: Response, next: NextFunction) => {
+        const encoding = pickEncoding(req.headers['accept-encoding']);
+        if (!encoding) {
+            return next();
+        }
+
+        const send = res.send.bind(res);
+        // res.json() hands a JSON string or a MessagePack buffer to res.send, so this covers every response
+        res.send = (body?: any) => {
+            const raw = typeof body === 'string' ? Buffer.from(body) : Buffer.isBuffer(body) ? body : null;
+            if (!raw || raw.length < MIN_COMPRESS_BYTES || res.getHeader('Content-Encoding')) {
+                return send(body);
+            }
+            const compressed = encoding === 'br'
+                ? zlib.brotliCompressSync(raw, { params: { [zlib.constants.BROTLI_PARAM_QUALITY]: 4 } })
+                : encoding === 'gzip' ? zlib.gzipSync(raw) : zlib.deflateSync(raw);
+            res.setHeader('Content-Encoding', encoding);
+            res.vary('Accept-Encoding');
+            return send(compressed);
+        };
+        next();
+    };
+}
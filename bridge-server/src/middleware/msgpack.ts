@@ -0,0 +1,177 @@
+import express, { Request, Response, NextFunction } from 'express';
+import { ResponseHelper } from '../utils/response';
+
+// MessagePack for clients that ask for it (Accept) or send it (Content-Type). Only the value
+// types JSON has are encoded, with the same rules as res.json: toJSON() is honoured, undefined
+// and function properties are dropped, non-finite numbers become nil.
+const MSGPACK_TYPES = ['application/msgpack', 'application/x-msgpack'];
+
+function header(length: number, fix: number, fixLimit: number, wide: [number, number, number]): Buffer {
+    if (length < fixLimit) return Buffer.from([fix | length]);
+    if (length < 0x100 && wide[0]) return Buffer.from([wide[0], length]);
+    if (length < 0x10000) {
+        const head = Buffer.alloc(3);
+        head[0] = wide[1];
+        head.writeUInt16BE(length, 1);
+        return head;
+    }
+    const head = Buffer.alloc(5);
+    head[0] = wide[2];
+    head.writeUInt32BE(length, 1);
+    return head;
+}
+
+function encodeNumber(value: number): Buffer {
+    if (!Number.isFinite(value)) return Buffer.from([0xc0]);
+    if (!Number.isSafeInteger(value)) {
+        const out = Buffer.alloc(9);
+        out[0] = 0xcb;
+        out.writeDoubleBE(value, 1);
+        return out;
+    }
+    if (value >= 0) {
+        if (value < 0x80) return Buffer.from([value]);
+        if (value < 0x100) return Buffer.from([0xcc, value]);
+        const out = Buffer.alloc(value < 0x10000 ? 3 : value < 0x100000000 ? 5 : 9);
+        out[0] = value < 0x10000 ? 0xcd : value < 0x100000000 ? 0xce : 0xcf;
+        if (out.length === 3) out.writeUInt16BE(value, 1);
+        else if (out.length === 5) out.writeUInt32BE(value, 1);
+        else out.writeBigUInt64BE(BigInt(value), 1);
+        return out;
+    }
+    if (value >= -32) return Buffer.from([value & 0xff]);
+    if (value >= -0x80) return Buffer.from([0xd0, value & 0xff]);
+    const out = Buffer.alloc(value >= -0x8000 ? 3 : value >= -0x80000000 ? 5 : 9);
+    out[0] = value >= -0x8000 ? 0xd1 : value >= -0x80000000 ? 0xd2 : 0xd3;
+    if (out.length === 3) out.writeInt16BE(value, 1);
+    else if (out.length === 5) out.writeInt32BE(value, 1);
+    else out.writeBigInt64BE(BigInt(value), 1);
+    return out;
+}
+
+function encodeInto(value: any, chunks: Buffer[]): void {
+    if (value !== null && typeof value === 'object' && typeof value.toJSON === 'function') {
+        value = value.toJSON();
+    }
+    if (value === null || value === undefined || typeof value === 'function' || typeof value === 'symbol') {
+        chunks.push(Buffer.from([0xc0]));
+    } else if (typeof value === 'boolean') {
+        chunks.push(Buffer.from([value ? 0xc3 : 0xc2]));
+    } else if (typeof value === 'number') {
+        chunks.push(encodeNumber(value));
+    } else if (typeof value === 'string') {
+        const bytes = Buffer.from(value, 'utf8');
+        chunks.push(header(bytes.length, 0xa0, 32, [0xd9, 0xda, 0xdb]), bytes);
+    } else if (Buffer.isBuffer(value)) {
+        chunks.push(header(value.length, 0, 0, [0xc4, 0xc5, 0xc6]), value);
+    } else if (Array.isArray(value)) {
+        chunks.push(header(value.length, 0x90, 16, [0, 0xdc, 0xdd]));
+        value.forEach(item => encodeInto(item, chunks));
+    } else {
+        const entries = Object.entries(value).filter(([, item]) => item !== undefined && typeof item !== 'function');
+        chunks.push(header(entries.length, 0x80, 16, [0, 0xde, 0xdf]));
+        for (const [key, item] of entries) {
+            encodeInto(key, chunks);
+            encodeInto(item, chunks);
+        }
+    }
+}
+
+export function encodeMsgpack(value: any): Buffer {
+    const chunks: Buffer[] = [];
+    encodeInto(value, chunks);
+    return Buffer.concat(chunks);
+}
+
+export function decodeMsgpack(buffer: Buffer): any {
+    let offset = 0;
+
+    const take = (length: number) => {
+        if (offset + length > buffer.length) throw new Error('Truncated MessagePack body');
+        const start = offset;
+        offset += length;
+        return start;
+    };
+    const str = (length: number) => buffer.toString('utf8', take(length), offset);
+    const bin = (length: number) => Buffer.from(buffer.subarray(take(length), offset));
+    const array = (length: number) => Array.from({ length }, () => read());
+    const map = (length: number) => {
+        const result: Record<string, any> = {};
+        for (let i = 0; i < length; i++) {
+            result[String(read())] = read();
+        }
+        return result;
+    };
+
+    function read(): any {
+        const byte = buffer[take(1)];
+        if (byte < 0x80) return byte;
+        if (byte >= 0xe0) return byte - 0x100;
+        if ((byte & 0xf0) === 0x80) return map(byte & 0x0f);
+        if ((byte & 0xf0) === 0x90) return array(byte & 0x0f);
+        if ((byte & 0xe0) === 0xa0) return str(byte & 0x1f);
+        switch (byte) {
+            case 0xc0: return null;
+            case 0xc2: return false;
+            case 0xc3: return true;
+            case 0xc4: return bin(buffer.readUInt8(take(1)));
+            case 0xc5: return bin(buffer.readUInt16BE(take(2)));
+            case 0xc6: return bin(buffer.readUInt32BE(take(4)));
+            case 0xca: return buffer.readFloatBE(take(4));
+            case 0xcb: return buffer.readDoubleBE(take(8));
+            case 0xcc: return buffer.readUInt8(take(1));
+            case 0xcd: return buffer.readUInt16BE(take(2));
+            case 0xce: return buffer.readUInt32BE(take(4));
+            case 0xcf: return Number(buffer.readBigUInt64BE(take(8)));
+            case 0xd0: return buffer.readInt8(take(1));
+            case 0xd1: return buffer.readInt16BE(take(2));
+            case 0xd2: return buffer.readInt32BE(take(4));
+            case 0xd3: return Number(buffer.readBigInt64BE(take(8)));
+            case 0xd9: return str(buffer.readUInt8(take(1)));
+            case 0xda: return str(buffer.readUInt16BE(take(2)));
+            case 0xdb: return str(buffer.readUInt32BE(take(4)));
+            case 0xdc: return array(buffer.readUInt16BE(take(2)));
+            case 0xdd: return array(buffer.readUInt32BE(take(4)));
+            case 0xde: return map(buffer.readUInt16BE(take(2)));
+            case 0xdf: return map(buffer.readUInt32BE(take(4)));
+            default: throw new Error(`Unsupported MessagePack type 0x${byte.toString(16)}`);
+        }
+    }
+
+    const value = read();
+    if (offset !== buffer.length) throw new Error('Trailing bytes after MessagePack body');
+    return value;
+}
+
+// Parses application/msgpack request bodies into req.body, next to express.json()
+export function parseMsgpack() {
+    const raw = express.raw({ type: MSGPACK_TYPES });
+    return (req: Request, res: Response, next: NextFunction) => {
+        raw(req, res, (err?: any) => {
+            if (err) return next(err);
+            if (!req.is(MSGPACK_TYPES) || !Buffer.isBuffer(req.body)) return next();
+            try {
+                req.body = decodeMsgpack(req.body);
+            } catch (error) {
+                return ResponseHelper.badRequest(res, error instanceof Error ? error.message : 'Invalid MessagePack body');
+            }
+            next();
+        });
+    };
+}
+
+// Answers res.json() in MessagePack when the client prefers it over JSON
+export function msgpackResponses() {
+    return (req: Request, res: Response, next: NextFunction) => {
+        res.vary('Accept');
+        const preferred = req.accepts(['application/json', ...MSGPACK_TYPES]);
+        if (!preferred || !MSGPACK_TYPES.includes(preferred)) {
+            return next();
+        }
+        res.json = (body?: any) => {
+            res.setHeader('Content-Type', 'application/msgpack');
+            return res.send(encodeMsgpack(body));
+        };
+        next();
+    };
+}
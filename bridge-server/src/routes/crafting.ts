@@ -3,7 +3,7 @@ import MinecraftBot from '../bot';
 import { ResponseHelper } from '../utils/response';
 import { requireBot } from '../middleware/auth';
 import { asyncHandler } from '../middleware/error';
-import { CraftRequest } from '../types';
+import { CraftRequest, FurnaceLoadRequest, FurnaceRequest } from '../types';
 
 export function createCraftingRoutes(bot: MinecraftBot): Router {
     const router = Router();
@@ -23,6 +23,50 @@ export function createCraftingRoutes(bot: MinecraftBot): Router {
         }
     }));
 
+    router.post('/furnaces', requireBot(bot), (req, res) => {
+        const { maxDistance = 16 } = req.body ?? {};
+
+        try {
+            const furnaces = bot.findFurnaces(maxDistance);
+            ResponseHelper.success(res, { furnaces }, `Found ${furnaces.length} furnace(s)`);
+        } catch (error) {
+            ResponseHelper.error(res, error instanceof Error ? error.message : 'Furnace search failed');
+        }
+    });
+
+    router.post('/furnace/load', requireBot(bot), asyncHandler(async (req, res) => {
+        const { x, y, z, itemType, count, fuelType = 'coal', fuelCount = 0 }: FurnaceLoadRequest = req.body;
+
+        if (![x, y, z, count].every(value => typeof value === 'number')) {
+            return ResponseHelper.badRequest(res, 'x, y, z and count must be numbers');
+        }
+        if (typeof itemType !== 'string' || !itemType.trim()) {
+            return ResponseHelper.badRequest(res, 'Item type must be a non-empty string');
+        }
+
+        try {
+            const result = await bot.loadFurnace(x, y, z, itemType, count, fuelType, fuelCount);
+            ResponseHelper.success(res, result, `Loaded ${result.loaded}x ${itemType} and ${result.fuelLoaded}x ${fuelType}`);
+        } catch (error) {
+            ResponseHelper.error(res, error instanceof Error ? error.message : 'Furnace load failed');
+        }
+    }));
+
+    router.post('/furnace/collect', requireBot(bot), asyncHandler(async (req, res) => {
+        const { x, y, z }: FurnaceRequest = req.body;
+
+        if (![x, y, z].every(value => typeof value === 'number')) {
+            return ResponseHelper.badRequest(res, 'x, y and z must be numbers');
+        }
+
+        try {
+            const result = await bot.collectFurnace(x, y, z);
+            ResponseHelper.success(res, result, `Collected ${result.collected}x ${result.item ?? 'nothing'}`);
+        } catch (error) {
+            ResponseHelper.error(res, error instanceof Error ? error.message : 'Furnace collect failed');
+        }
+    }));
+
     // Future crafting endpoints:
     // router.get('/recipes', ...)
     // router.post('/recipe', ...)
@@ -0,0 +1,21 @@
+import { Router } from 'express';
+import MinecraftBot from '../bot';
+import { ResponseHelper } from '../utils/response';
+import { requireBot } from '../middleware/auth';
+
+export function createEntityRoutes(bot: MinecraftBot): Router {
+    const router = Router();
+
+    // ?since=<cursor> returns only entities changed and ids removed after that cursor
+    router.get('/nearby', requireBot(bot), (req, res) => {
+        const since = req.query.since !== undefined ? Number(req.query.since) : undefined;
+
+        try {
+            ResponseHelper.success(res, bot.getNearbyEntities(since));
+        } catch (error) {
+            ResponseHelper.error(res, error instanceof Error ? error.message : 'Entity lookup failed');
+        }
+    });
+
+    return router;
+}
@@ -23,6 +23,15 @@ export function createMiningRoutes(bot: MinecraftBot): Router {
         }
     }));
 
+    router.post('/stop', requireBot(bot), (req, res) => {
+        try {
+            const result = bot.stopMining();
+            ResponseHelper.success(res, undefined, result);
+        } catch (error) {
+            ResponseHelper.error(res, error instanceof Error ? error.message : 'Stop failed');
+        }
+    });
+
     // Future mining endpoints:
     // router.post('/area', ...)
     // router.get('/nearby', ...)
@@ -53,4 +53,17 @@ export interface MineRequest {
 export interface CraftRequest {
     item: string;
     count?: number;
-}
\ No newline at end of file
+}
+
+export interface FurnaceRequest {
+    x: number;
+    y: number;
+    z: number;
+}
+
+export interface FurnaceLoadRequest extends FurnaceRequest {
+    itemType: string;
+    count: number;
+    fuelType?: string;
+    fuelCount?: number;
+}
@@ -1,54 +1,1867 @@
 # mcp-server/main.py - Enhanced with additional tools and actions
 import asyncio
 import aiohttp
+import anyio
+import atexit
+import functools
 import json
+import logging
+import math
+import numpy as np
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict, deque
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, List
-from fastmcp import FastMCP
+from fastmcp import FastMCP, Context
+from fastmcp.exceptions import NotFoundError
+from fastmcp.server.middleware import Middleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 import os
 
+# Optional fast codecs (the `fast` extra), used when installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 load_dotenv()
 
-# Configuration
-BOT_API_BASE = os.getenv("BOT_API_BASE", "http://localhost:3001")
+# Configuration; default file locations are next to this module, not the working directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_API_BASE = os.getenv("BOT_API_BASE", "http://localhost:3001")  # or unix:///path/to/bridge.sock
+BOT_API_RECORD = os.getenv("BOT_API_RECORD", "")  # path of the traffic log, empty = disabled
+BOT_API_CODEC = os.getenv("BOT_API_CODEC", "json")  # request body codec: "json" or "msgpack"
+BOT_API_MAX_INFLIGHT = int(os.getenv("BOT_API_MAX_INFLIGHT", "32"))  # ceiling for the adaptive in-flight limit, shared by all workers
+BOT_API_MAX_QUEUE = int(os.getenv("BOT_API_MAX_QUEUE", "64"))  # calls allowed to wait for a slot, beyond that shed (all workers)
+BOT_API_QUEUE_TIMEOUT = float(os.getenv("BOT_API_QUEUE_TIMEOUT", "2"))  # seconds a call may wait for a slot
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))  # >1 serves streamable HTTP from N processes
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", "8000"))
+MCP_STATE_BACKEND = os.getenv("MCP_STATE_BACKEND", "sqlite" if MCP_WORKERS > 1 else "memory")
+MCP_STATE_PATH = os.getenv("MCP_STATE_PATH", os.path.join(BASE_DIR, "mcp_state.db"))
+LOCK_TIMEOUT = float(os.getenv("LOCK_TIMEOUT", "30"))  # seconds a tool waits for its resources, 0 = forever
+LOCK_LEASE = float(os.getenv("LOCK_LEASE", "60"))  # shared lease length, renewed while held
+HEALTH_PROBE_MIN = float(os.getenv("HEALTH_PROBE_MIN", "1"))  # probe interval while failing (seconds)
+HEALTH_PROBE_MAX = float(os.getenv("HEALTH_PROBE_MAX", "30"))  # probe interval ceiling while healthy
+POSITION_SAMPLE_INTERVAL = float(os.getenv("POSITION_SAMPLE_INTERVAL", "1"))  # seconds, 0 disables the sampler
+POSITION_BUFFER_SIZE = int(os.getenv("POSITION_BUFFER_SIZE", "600"))  # samples kept (10 min at 1 Hz)
+WAYPOINT_DB = os.getenv("WAYPOINT_DB", os.path.join(BASE_DIR, "waypoints.db"))
+WAYPOINT_SYNC_TTL = float(os.getenv("WAYPOINT_SYNC_TTL", "300"))  # seconds before re-pulling bridge waypoints
+WAYPOINT_SYNC_RETRY = float(os.getenv("WAYPOINT_SYNC_RETRY", "30"))  # seconds before retrying a failed pull
+ENTITY_POLL_INTERVAL = float(os.getenv("ENTITY_POLL_INTERVAL", "1"))  # seconds, 0 disables the entity tracker
+FARM_DB = os.getenv("FARM_DB", os.path.join(BASE_DIR, "farm.db"))
+SCAN_CONCURRENCY = int(os.getenv("SCAN_CONCURRENCY", "4"))  # scan tiles requested at once
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))  # cap on any profile, tool mode included
+MCP_ADMIN_TOKEN = os.getenv("MCP_ADMIN_TOKEN", "")  # bearer token for /admin/* routes, empty = no check
+
+logger = logging.getLogger("minecraft-mcp")
+
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    """Close the shared bridge session when the server shuts down"""
+    try:
+        yield {}
+    finally:
+        await close_session()
 
 # Initialize MCP server
-mcp = FastMCP("Minecraft RPG Bot")
+mcp = FastMCP("Minecraft RPG Bot", lifespan=server_lifespan)
 
-with open("mcp.json", "r", encoding="utf-8") as f:
+with open(os.path.join(BASE_DIR, "mcp.json"), "r", encoding="utf-8") as f:
     mcp_template = json.load(f)
 
 @mcp.get("/capabilities")
 async def get_capabilities():
     return JSONResponse(content=mcp_template)
 
-async def make_api_request(endpoint: str, method: str = "GET", data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    """Make HTTP request to bot API"""
-    url = f"{BOT_API_BASE}{endpoint}"
+# ============ SHARED STATE ============
+class StateBackend(ABC):
+    """Key/value store with TTLs and named leases, shared by every worker of the MCP server.
+
+    Values must be JSON-serialisable. Leases give mutual exclusion between processes:
+    `acquire` succeeds when the lease is free, expired or already held by `owner`.
+    Code on the event loop uses the async `a*` variants, which run blocking backends in a thread.
+    """
+    blocking = False  # True when calls do I/O that may wait, e.g. on another process's write lock
+
+    @abstractmethod
+    def get(self, key: str, default: Any = None) -> Any: ...
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def scan(self, prefix: str) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def acquire(self, name: str, owner: str, ttl: float) -> bool: ...
+
+    @abstractmethod
+    def release(self, name: str, owner: str) -> None: ...
+
+    async def _offload(self, func, *args) -> Any:
+        if self.blocking:
+            return await asyncio.to_thread(func, *args)
+        return func(*args)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        return await self._offload(self.get, key, default)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self._offload(self.set, key, value, ttl)
+
+    async def adelete(self, key: str) -> None:
+        await self._offload(self.delete, key)
+
+    async def ascan(self, prefix: str) -> Dict[str, Any]:
+        return await self._offload(self.scan, prefix)
+
+    async def aacquire(self, name: str, owner: str, ttl: float) -> bool:
+        return await self._offload(self.acquire, name, owner, ttl)
+
+    async def arelease(self, name: str, owner: str) -> None:
+        await self._offload(self.release, name, owner)
+
+class MemoryStateBackend(StateBackend):
+    """In-process state, for the default single-process server"""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._leases: Dict[str, Any] = {}
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or (entry[1] is not None and entry[1] < time.time()):
+            return default
+        return entry[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def scan(self, prefix: str) -> Dict[str, Any]:
+        now = time.time()
+        return {key: value for key, (value, expires) in self._data.items()
+                if key.startswith(prefix) and (expires is None or expires >= now)}
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        holder = self._leases.get(name)
+        if holder is not None and holder[0] != owner and holder[1] > now:
+            return False
+        self._leases[name] = (owner, now + ttl)
+        return True
+
+    def release(self, name: str, owner: str) -> None:
+        holder = self._leases.get(name)
+        if holder is not None and holder[0] == owner:
+            del self._leases[name]
+
+class SQLiteStateBackend(StateBackend):
+    """State in a local SQLite database in WAL mode, shared by worker processes on one host"""
+    blocking = True
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires >= ?)", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value, separators=(",", ":")), time.time() + ttl if ttl else None)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def scan(self, prefix: str) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM kv WHERE substr(key, 1, ?) = ? AND (expires IS NULL OR expires >= ?)",
+                (len(prefix), prefix, time.time())
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+                (name, owner, now + ttl, now)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, name: str, owner: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+def create_state_backend(kind: str) -> StateBackend:
+    if kind == "memory":
+        return MemoryStateBackend()
+    if kind == "sqlite":
+        return SQLiteStateBackend(MCP_STATE_PATH)
+    raise ValueError(f"Unknown MCP_STATE_BACKEND: {kind}")
+
+state = create_state_backend(MCP_STATE_BACKEND)
+
+# ============ CODECS ============
+class JsonCodec:
+    """JSON via orjson when installed, stdlib json otherwise"""
+    content_type = "application/json"
+
+    def encode(self, obj: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, raw: bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw)
+
+class MsgpackCodec:
+    """MessagePack, only offered to the bridge when msgpack is installed"""
+    content_type = "application/msgpack"
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def decode(self, raw: bytes) -> Any:
+        return msgpack.unpackb(raw, raw=False)
+
+json_codec = JsonCodec()
+codecs: Dict[str, Any] = {json_codec.content_type: json_codec}
+if msgpack is not None:
+    codecs[MsgpackCodec.content_type] = codecs["application/x-msgpack"] = MsgpackCodec()
+
+# Request bodies start as JSON; with BOT_API_CODEC=msgpack they switch once the bridge has
+# answered in msgpack, which shows it can also parse it
+request_codec = json_codec
+ACCEPT = "application/msgpack, application/json;q=0.9" if "application/msgpack" in codecs else "application/json"
+ACCEPT_ENCODING = "gzip, deflate, br" if brotli is not None else "gzip, deflate"
+
+# Per-endpoint wire statistics: calls, bytes received, bytes after decompression, decode time
+transport_stats: Dict[str, Dict[str, float]] = {}
+
+def decode_response(endpoint: str, raw: bytes, headers: Any) -> Any:
+    """Decompress and decode a bridge response according to its headers, recording wire stats"""
+    global request_codec
+    t0 = time.perf_counter()
+    encoding = headers.get("Content-Encoding", "").lower()
+    if encoding == "gzip":
+        body = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+    elif encoding == "deflate":
+        body = zlib.decompress(raw)
+    elif encoding == "br" and brotli is not None:
+        body = brotli.decompress(raw)
+    else:
+        body = raw
+    content_type = headers.get("Content-Type", "").split(";")[0].strip().lower()
+    codec = codecs.get(content_type, json_codec)
+    result = codec.decode(body)
+    if BOT_API_CODEC == "msgpack" and isinstance(codec, MsgpackCodec):
+        request_codec = codec
+
+    stats = transport_stats.setdefault(endpoint.split("?")[0], {"calls": 0, "wire_bytes": 0, "body_bytes": 0, "decode_ms": 0.0})
+    stats["calls"] += 1
+    stats["wire_bytes"] += len(raw)
+    stats["body_bytes"] += len(body)
+    stats["decode_ms"] += (time.perf_counter() - t0) * 1000
+    return result
+
+# ============ TRAFFIC RECORDING ============
+class TrafficRecorder:
+    """Append-only JSON-lines log of bridge traffic, written off the hot path.
+
+    Each line holds: ts, endpoint, method, body, status, latency_ms, response.
+    `replay.py` serves a log back as a stub bridge or replays its load pattern.
+    """
+
+    def __init__(self, path: str, max_pending: int = 10000):
+        self.path = path
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._writer: Optional[asyncio.Task] = None
+        atexit.register(self._flush_pending)
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Queue an entry without blocking; entries are dropped if the writer falls behind"""
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await asyncio.to_thread(self._append, batch)
+
+    def _append(self, batch: List[Dict[str, Any]]) -> None:
+        lines = "".join(json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n" for entry in batch)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _flush_pending(self) -> None:
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            self._append(batch)
+
+# Each worker process writes its own log so batches from different processes never interleave
+recorder = None
+if BOT_API_RECORD:
+    recorder = TrafficRecorder(f"{BOT_API_RECORD}.{os.getpid()}" if MCP_WORKERS > 1 else BOT_API_RECORD)
+
+# ============ ADMISSION CONTROL ============
+# Endpoints that answer when a game action finishes: they hold a slot, but their duration says nothing about bridge load
+LONG_RUNNING_ENDPOINTS = frozenset({
+    "/movement/moveTo", "/movement/follow", "/movement/explore", "/movement/spawn",
+    "/navigation/goto", "/navigation/patrol", "/mining/block", "/mining/vein",
+    "/building/clear", "/building/fill", "/building/structure", "/collection/items",
+    "/farming/harvest", "/emergency/recall", "/survival/shelter", "/quest", "/quest/autonomous",
+})
+
+class AdmissionController:
+    """Bounds in-flight bridge calls with a latency-driven limit and a short FIFO queue.
+
+    The limit follows the gradient between the best and the smoothed recent latency: it shrinks
+    when the bridge queues internally and grows back while latency stays near the baseline.
+    """
+    TOLERANCE = 2.0  # smoothed latency may reach this multiple of the baseline before the limit shrinks
+    BASELINE_RESET = 500  # samples before the baseline is re-learned, so it can follow a slower bridge
+
+    def __init__(self, max_inflight: int, max_queue: int, queue_timeout: float):
+        self.max_inflight = max(max_inflight, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.limit = float(min(self.max_inflight, 8))
+        self.inflight = 0
+        self.waiters: deque = deque()
+        self.min_rtt: Optional[float] = None
+        self.srtt: Optional[float] = None
+        self._samples = 0
+        self._started: List[float] = []  # admission times of the timed calls in flight, oldest first
+        self.metrics = {"admitted": 0, "queued": 0, "shed": 0, "timed_out": 0, "wait_ms_max": 0.0}
+
+    def retry_after_ms(self) -> int:
+        """Expected time until a slot frees up for a new call, after the calls already queued"""
+        per_call = self.srtt if self.srtt is not None else 0.05
+        now = time.perf_counter()
+        # A timed call should finish about srtt after its start; after that its slot turns over every srtt
+        frees = [max(started + per_call - now, 0.0) for started in self._started] or [per_call]
+        ahead = len(self.waiters)
+        wait = frees[ahead % len(frees)] + (ahead // len(frees)) * per_call
+        return max(50, round(wait * 1000))
+
+    def busy(self, reason: str) -> Dict[str, Any]:
+        retry_after = self.retry_after_ms()
+        return {
+            "success": False,
+            "busy": True,
+            "retryAfterMs": retry_after,
+            "error": f"Bridge busy ({reason}: {self.inflight} in flight, {len(self.waiters)} queued), retry after {retry_after} ms"
+        }
+
+    async def acquire(self) -> Optional[Dict[str, Any]]:
+        """Take an in-flight slot, or return the busy answer when the call is shed"""
+        if self.inflight < int(self.limit) and not self.waiters:
+            self.inflight += 1
+            self.metrics["admitted"] += 1
+            return None
+        if len(self.waiters) >= self.max_queue:
+            self.metrics["shed"] += 1
+            return self.busy("queue full")
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.metrics["queued"] += 1
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout or None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            granted = waiter.done() and not waiter.cancelled()
+            if isinstance(e, asyncio.CancelledError):
+                if granted:
+                    self.release()
+                else:
+                    self._forget(waiter)
+                raise
+            if not granted:
+                # The slot may have been handed over just as the timeout fired
+                self._forget(waiter)
+                self.metrics["timed_out"] += 1
+                return self.busy("queue timeout")
+        self.metrics["admitted"] += 1
+        self.metrics["wait_ms_max"] = max(self.metrics["wait_ms_max"], (time.perf_counter() - t0) * 1000)
+        return None
+
+    def _forget(self, waiter: asyncio.Future) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def begin(self) -> float:
+        """Start timing an admitted call; the returned start is handed back to release"""
+        started = time.perf_counter()
+        self._started.append(started)
+        return started
+
+    def release(self, started: Optional[float] = None, answered: bool = False) -> None:
+        """Free the slot, feed the latency of an answered timed call into the limit and wake waiters"""
+        self.inflight -= 1
+        if started is not None:
+            self._started.remove(started)
+            if answered:
+                self._update_limit(time.perf_counter() - started)
+        while self.waiters and self.inflight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.inflight += 1
+                waiter.set_result(None)
+
+    def _update_limit(self, latency: float) -> None:
+        self._samples += 1
+        if self.min_rtt is None or self._samples % self.BASELINE_RESET == 0:
+            self.min_rtt = self.srtt if self.srtt is not None else latency
+        self.min_rtt = min(self.min_rtt, latency)
+        self.srtt = latency if self.srtt is None else 0.9 * self.srtt + 0.1 * latency
+        
+        gradient = max(0.5, min(1.0, self.TOLERANCE * self.min_rtt / max(self.srtt, 1e-6)))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = max(1.0, min(float(self.max_inflight), 0.8 * self.limit + 0.2 * target))
+
+admission: Dict[str, AdmissionController] = {}
+
+def get_admission() -> AdmissionController:
+    """Admission controller of the current bridge backend.
+
+    Each worker gets an equal share of the in-flight ceiling and the queue, so the bridge never
+    sees more than BOT_API_MAX_INFLIGHT calls from the whole server.
+    """
+    controller = admission.get(BOT_API_BASE)
+    if controller is None:
+        workers = max(MCP_WORKERS, 1)
+        controller = admission[BOT_API_BASE] = AdmissionController(
+            BOT_API_MAX_INFLIGHT // workers, max(BOT_API_MAX_QUEUE // workers, 1), BOT_API_QUEUE_TIMEOUT)
+    return controller
+
+# ============ BRIDGE CLIENT ============
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_closing: set = set()  # close tasks of sessions left over from a previous event loop
+
+def get_session() -> aiohttp.ClientSession:
+    """Shared keep-alive session to the bridge, over a UNIX socket when BOT_API_BASE is unix://"""
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is not None and not _session.closed and _session_loop is not loop:
+        stale, stale_loop = _session, _session_loop
+        if stale_loop.is_running():
+            asyncio.run_coroutine_threadsafe(stale.close(), stale_loop)
+        else:
+            # Its loop has stopped, so there is nothing left to flush: closing only drops the connections
+            _closing.add(loop.create_task(_close_stale(stale)))
+    if _session is None or _session.closed or _session_loop is not loop:
+        if BOT_API_BASE.startswith("unix://"):
+            connector = aiohttp.UnixConnector(path=BOT_API_BASE[len("unix://"):])
+        else:
+            connector = aiohttp.TCPConnector()
+        # Decompression is done in decode_response so the compressed size can be measured
+        _session = aiohttp.ClientSession(connector=connector, auto_decompress=False)
+        _session_loop = loop
+    return _session
+
+async def _close_stale(session: aiohttp.ClientSession) -> None:
+    try:
+        await session.close()
+    except RuntimeError:
+        pass  # futures of a stopped but unclosed loop cannot be awaited here
+    finally:
+        _closing.discard(asyncio.current_task())
+
+async def close_session() -> None:
+    """Close the shared bridge session (server shutdown, scripts that drive make_api_request directly)"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+def api_url(endpoint: str) -> str:
+    """Full request URL; the host part is ignored by the UNIX socket connector"""
+    if BOT_API_BASE.startswith("unix://"):
+        return f"http://localhost{endpoint}"
+    return f"{BOT_API_BASE}{endpoint}"
+
+async def make_api_request(endpoint: str, method: str = "GET", data: Optional[Dict[str, Any]] = None,
+                           gated: bool = True) -> Dict[str, Any]:
+    """Make HTTP request to bot API, failing fast when the prober knows the bridge or bot is down
+    or shedding the call when too many are already in flight (background probes are never shed)
+    """
+    controller = None
+    if gated:
+        start_background_tasks()
+        blocked = await liveness_error(endpoint)
+        if blocked:
+            return {"success": False, "error": blocked}
+        controller = get_admission()
+        shed = await controller.acquire()
+        if shed is not None:
+            return shed
+    
+    url = api_url(endpoint)
+    status = None
+    started = time.time()
+    t0 = time.perf_counter()
+    timed = None
+    if controller is not None and endpoint.split("?")[0] not in LONG_RUNNING_ENDPOINTS:
+        timed = controller.begin()
     
     try:
-        async with aiohttp.ClientSession() as session:
-            if method == "GET":
-                async with session.get(url) as response:
-                    result = await response.json()
-                    return result
-            elif method == "POST":
-                async with session.post(url, json=data) as response:
-                    result = await response.json()
-                    return result
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported HTTP method: {method}")
+        headers = {"Accept": ACCEPT, "Accept-Encoding": ACCEPT_ENCODING}
+        body = None
+        if method == "POST" and data is not None:
+            body = request_codec.encode(data)
+            headers["Content-Type"] = request_codec.content_type
+        
+        async with get_session().request(method, url, data=body, headers=headers) as response:
+            status = response.status
+            try:
+                raw = await response.read()
+            except asyncio.CancelledError:
+                # Drop the half-read connection instead of handing it back to the pool
+                response.close()
+                raise
+            result = decode_response(endpoint, raw, response.headers)
     except aiohttp.ClientError as e:
-        return {
+        result = {
             "success": False,
             "error": f"Connection error: {str(e)}"
         }
+        if gated and _probe_wakeup is not None:
+            # Don't wait out a long healthy interval to find out the bridge is gone
+            _probe_wakeup.set()
     except Exception as e:
-        return {
+        result = {
             "success": False,
             "error": f"Request failed: {str(e)}"
         }
+    finally:
+        if controller is not None:
+            # Only answered calls say something about bridge latency
+            controller.release(timed, answered=status is not None)
+    
+    if recorder is not None:
+        recorder.record({
+            "ts": started,
+            "endpoint": endpoint,
+            "method": method,
+            "body": data,
+            "status": status,
+            "latency_ms": round((time.perf_counter() - t0) * 1000, 3),
+            "response": result
+        })
+    return result
+
+# ============ HEALTH PROBER ============
+_background: Dict[str, asyncio.Task] = {}
+_background_loop: Optional[asyncio.AbstractEventLoop] = None
+_probe_wakeup: Optional[asyncio.Event] = None
+
+def start_background_tasks() -> None:
+    """Start the server's background loops on first use per event loop, and restart any that ended"""
+    global _background_loop, _probe_wakeup
+    loop = asyncio.get_running_loop()
+    if _background_loop is not loop:
+        _background.clear()
+        _background_loop = loop
+        _probe_wakeup = asyncio.Event()
+    loops = {"health": health_probe_loop}
+    if POSITION_SAMPLE_INTERVAL > 0:
+        loops["position"] = position_sample_loop
+    if ENTITY_POLL_INTERVAL > 0:
+        loops["entities"] = entity_poll_loop
+    for name, run in loops.items():
+        task = _background.get(name)
+        if task is not None and not task.done():
+            continue
+        if task is not None and not task.cancelled() and task.exception() is not None:
+            logger.error("Background loop %s died, restarting", name, exc_info=task.exception())
+        _background[name] = loop.create_task(run())
+
+def _ago(timestamp: Optional[float]) -> str:
+    return f"{time.time() - timestamp:.1f}s ago" if timestamp else "never"
+
+async def liveness_error(endpoint: str) -> Optional[str]:
+    """Reason to refuse a call from the cached liveness state, or None to let it through"""
+    live = await state.aget("liveness")
+    if not live or time.time() - live["checked_at"] > 3 * HEALTH_PROBE_MAX:
+        return None  # unknown or stale: let the request find out
+    if not live["bridge"]:
+        return f"Bot API unreachable ({live.get('error')}), last successful probe {_ago(live.get('last_ok'))}"
+    if not live["bot"] and endpoint not in ("/health", "/bot/status"):
+        return f"Bot is not connected to the Minecraft server, last seen connected {_ago(live.get('bot_last_ok'))}"
+    return None
+
+async def probe_health() -> Dict[str, Any]:
+    """Probe /health and /bot/status once and publish the result as the shared liveness state"""
+    previous = await state.aget("liveness") or {}
+    now = time.time()
+    live = {
+        "checked_at": now,
+        "bridge": False,
+        "bot": False,
+        "server": "unreachable",
+        "botStatus": "unknown",
+        "message": None,
+        "error": None,
+        "last_ok": previous.get("last_ok"),
+        "bot_last_ok": previous.get("bot_last_ok"),
+    }
+    health = await make_api_request("/health", gated=False)
+    if health.get("success"):
+        data = health.get("data", {})
+        live.update(bridge=True, last_ok=now, server=data.get("server", "unknown"),
+                    botStatus=data.get("bot", "unknown"), message=health.get("message"))
+        status = await make_api_request("/bot/status", gated=False)
+        live["bot"] = bool(status.get("success") and status.get("data", {}).get("connected"))
+        if live["bot"]:
+            live["bot_last_ok"] = now
+        else:
+            live["error"] = status.get("error", "bot not connected")
+    else:
+        live["error"] = health.get("error", "Cannot reach bot API")
+    await state.aset("liveness", live)
+    return live
+
+async def health_probe_loop() -> None:
+    """Probe on an adaptive interval: doubling while healthy, back to the minimum on any failure.
+
+    With several workers only the holder of the prober lease probes; the others read the shared state.
+    A connection error on a tool call wakes the worker that saw it, which probes straight away even
+    without the lease so every worker stops trusting a stale healthy state.
+    """
+    interval = HEALTH_PROBE_MIN
+    owner = f"{os.getpid()}"
+    woken = False
+    while True:
+        try:
+            holder = await state.aacquire("lease:health_prober", owner, HEALTH_PROBE_MAX + 10)
+            if holder or woken:
+                try:
+                    live = await probe_health()
+                    healthy = live["bridge"] and live["bot"]
+                except Exception:
+                    healthy = False
+                interval = min(interval * 2, HEALTH_PROBE_MAX) if healthy else HEALTH_PROBE_MIN
+                if holder:
+                    await state.aset("liveness_interval", interval)
+        except Exception:
+            # e.g. the shared SQLite state is locked by another worker: keep the loop alive
+            logger.exception("Health prober iteration failed")
+            interval = HEALTH_PROBE_MIN
+        wakeup = _probe_wakeup
+        try:
+            await asyncio.wait_for(wakeup.wait(), interval)
+            woken = True
+        except asyncio.TimeoutError:
+            woken = False
+        wakeup.clear()
+
+# ============ POSITION TELEMETRY ============
+class PositionRing:
+    """Fixed-size ring buffer of (t, x, y, z, yaw, pitch) position samples"""
+
+    def __init__(self, size: int):
+        self._buffer = np.zeros((size, 6), dtype=np.float64)
+        self._next = 0
+        self.count = 0
+
+    def append(self, t: float, x: float, y: float, z: float, yaw: float, pitch: float) -> None:
+        self._buffer[self._next] = (t, x, y, z, yaw, pitch)
+        self._next = (self._next + 1) % len(self._buffer)
+        self.count = min(self.count + 1, len(self._buffer))
+
+    def window(self, seconds: float) -> np.ndarray:
+        """Samples of the last `seconds`, oldest first"""
+        if self.count < len(self._buffer):
+            samples = self._buffer[:self.count]
+        else:
+            samples = np.concatenate((self._buffer[self._next:], self._buffer[:self._next]))
+        if not len(samples):
+            return samples
+        return samples[samples[:, 0] >= samples[-1, 0] - seconds]
+
+positions = PositionRing(POSITION_BUFFER_SIZE)
+STUCK_RADIUS = 0.5  # blocks: staying within this for the stuck window counts as stuck
+TARGET_REACHED = 1.5  # blocks: closer than this clears the movement target
+
+async def set_movement_target(x: float, y: float, z: float, label: str) -> None:
+    await state.aset("movement_target", {"x": x, "y": y, "z": z, "label": label, "set_at": time.time()})
+
+async def clear_movement_target() -> None:
+    await state.adelete("movement_target")
+
+async def position_sample_loop() -> None:
+    """Sample the bot's position into the ring buffer.
+
+    With several workers only the holder of the sampler lease asks the bridge; the others mirror its latest sample.
+    """
+    owner = f"{os.getpid()}"
+    while True:
+        try:
+            if await state.aacquire("lease:position_sampler", owner, POSITION_SAMPLE_INTERVAL + 10):
+                result = await make_api_request("/movement/position", gated=False)
+                if result.get("success"):
+                    data = result.get("data", {})
+                    sample = [time.time(), data.get("x", 0), data.get("y", 0), data.get("z", 0),
+                              data.get("yaw", 0), data.get("pitch", 0)]
+                    positions.append(*sample)
+                    await state.aset("position_latest", sample)
+                    target = await state.aget("movement_target")
+                    if target and np.hypot(np.hypot(sample[1] - target["x"], sample[2] - target["y"]),
+                                           sample[3] - target["z"]) < TARGET_REACHED:
+                        await clear_movement_target()
+            else:
+                sample = await state.aget("position_latest")
+                latest = positions.window(0)
+                if sample and (not len(latest) or sample[0] > latest[-1, 0]):
+                    positions.append(*sample)
+        except Exception:
+            logger.exception("Position sampler iteration failed")
+        await asyncio.sleep(POSITION_SAMPLE_INTERVAL)
+
+async def current_position() -> Optional[Dict[str, float]]:
+    """Latest sampled position if fresh, otherwise asked from the bridge"""
+    samples = positions.window(0)
+    if len(samples) and time.time() - samples[-1, 0] <= 2 * max(POSITION_SAMPLE_INTERVAL, 0.5):
+        return {"x": float(samples[-1, 1]), "y": float(samples[-1, 2]), "z": float(samples[-1, 3])}
+    result = await make_api_request("/movement/position")
+    if not result.get("success"):
+        return None
+    data = result.get("data", {})
+    return {"x": data.get("x", 0), "y": data.get("y", 0), "z": data.get("z", 0)}
+
+def movement_stats(samples: np.ndarray, stuck_seconds: float = 10.0) -> Dict[str, float]:
+    """Speed, distance and stuck detection over a window of samples, computed in one vectorized pass"""
+    t = samples[:, 0]
+    xyz = samples[:, 1:4]
+    steps = np.linalg.norm(np.diff(xyz, axis=0), axis=1)
+    distance = float(steps.sum())
+    elapsed = float(t[-1] - t[0])
+    displacement = float(np.linalg.norm(xyz[-1] - xyz[0]))
+    recent = xyz[t >= t[-1] - stuck_seconds]
+    spread = float(np.linalg.norm(recent - recent.mean(axis=0), axis=1).max())
+    return {
+        "samples": len(samples),
+        "elapsed": elapsed,
+        "distance": distance,
+        "displacement": displacement,
+        "speed": distance / elapsed if elapsed > 0 else 0.0,
+        "max_speed": float((steps / np.diff(t)).max()) if len(steps) else 0.0,
+        # Low straightness over a long path means the bot is circling or wandering
+        "straightness": displacement / distance if distance > 0 else 1.0,
+        "stuck": bool(t[-1] - t[0] >= stuck_seconds and spread < STUCK_RADIUS),
+    }
+
+def movement_eta(samples: np.ndarray, target: Dict[str, float]) -> Dict[str, float]:
+    """Distance to target and ETA from the least-squares closing speed over the samples"""
+    t = samples[:, 0]
+    remaining = np.linalg.norm(samples[:, 1:4] - np.array([target["x"], target["y"], target["z"]]), axis=1)
+    closing = float(-np.polyfit(t - t[0], remaining, 1)[0]) if len(samples) >= 2 and t[-1] > t[0] else 0.0
+    return {
+        "remaining": float(remaining[-1]),
+        "closing_speed": closing,
+        "eta": float(remaining[-1] / closing) if closing > 0 else float("inf"),
+    }
+
+# ============ WAYPOINT STORE ============
+class WaypointStore:
+    """Waypoints persisted in SQLite with a grid-bucket spatial index on (x, z).
+
+    Nearest/radius queries only read the buckets that can contain an answer, so they stay
+    fast with the large waypoint sets produced by mapping runs. Code on the event loop uses the
+    async `a*` variants, which run the queries in a thread.
+    """
+    BUCKET = 64  # blocks per grid cell side
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS waypoints (
+            name TEXT PRIMARY KEY, x REAL NOT NULL, y REAL NOT NULL, z REAL NOT NULL,
+            cx INTEGER NOT NULL, cz INTEGER NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS waypoints_bucket ON waypoints (cx, cz)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS waypoints_cz ON waypoints (cz)")
+
+    def _bucket(self, coordinate: float) -> int:
+        return math.floor(coordinate / self.BUCKET)
+
+    def _row(self, name: str, x: float, y: float, z: float) -> tuple:
+        return (name, x, y, z, self._bucket(x), self._bucket(z))
+
+    def upsert(self, name: str, x: float, y: float, z: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO waypoints VALUES (?, ?, ?, ?, ?, ?)", self._row(name, x, y, z))
+
+    def replace_all(self, waypoints: List[Dict[str, Any]]) -> None:
+        rows = [self._row(w["name"], w["x"], w["y"], w["z"]) for w in waypoints]
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM waypoints")
+            self._conn.executemany("INSERT OR REPLACE INTO waypoints VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT name, x, y, z FROM waypoints WHERE name = ?", (name,)).fetchone()
+        return dict(zip(("name", "x", "y", "z"), row)) if row else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, x, y, z FROM waypoints ORDER BY name").fetchall()
+        return [dict(zip(("name", "x", "y", "z"), row)) for row in rows]
+
+    def _in_buckets(self, cx0: int, cx1: int, cz0: int, cz1: int, inner: Optional[tuple] = None) -> List[tuple]:
+        query = "SELECT name, x, y, z FROM waypoints WHERE cx BETWEEN ? AND ? AND cz BETWEEN ? AND ?"
+        params = [cx0, cx1, cz0, cz1]
+        if inner:
+            query += " AND NOT (cx BETWEEN ? AND ? AND cz BETWEEN ? AND ?)"
+            params += list(inner)
+        return self._conn.execute(query, params).fetchall()
+
+    @staticmethod
+    def _with_distance(rows: List[tuple], x: float, y: float, z: float) -> List[Dict[str, Any]]:
+        return [{"name": name, "x": wx, "y": wy, "z": wz, "distance": math.dist((x, y, z), (wx, wy, wz))}
+                for name, wx, wy, wz in rows]
+
+    def within(self, x: float, y: float, z: float, radius: float) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._in_buckets(self._bucket(x - radius), self._bucket(x + radius),
+                                    self._bucket(z - radius), self._bucket(z + radius))
+        matches = [w for w in self._with_distance(rows, x, y, z) if w["distance"] <= radius]
+        return sorted(matches, key=lambda w: w["distance"])
+
+    def nearest(self, x: float, y: float, z: float, k: int) -> List[Dict[str, Any]]:
+        """k nearest waypoints, searching bucket rings outward from the query point"""
+        with self._lock:
+            # One MIN/MAX per subquery so each is answered from an index instead of a table scan
+            bounds = self._conn.execute(
+                "SELECT (SELECT MIN(cx) FROM waypoints), (SELECT MAX(cx) FROM waypoints), "
+                "(SELECT MIN(cz) FROM waypoints), (SELECT MAX(cz) FROM waypoints)"
+            ).fetchone()
+            if bounds[0] is None or k <= 0:
+                return []
+            cx, cz = self._bucket(x), self._bucket(z)
+            max_ring = max(abs(cx - bounds[0]), abs(cx - bounds[1]), abs(cz - bounds[2]), abs(cz - bounds[3]))
+            found: List[Dict[str, Any]] = []
+            for ring in range(max_ring + 1):
+                inner = (cx - ring + 1, cx + ring - 1, cz - ring + 1, cz + ring - 1) if ring else None
+                found += self._with_distance(self._in_buckets(cx - ring, cx + ring, cz - ring, cz + ring, inner), x, y, z)
+                found.sort(key=lambda w: w["distance"])
+                # Anything outside the searched square is at least ring * BUCKET blocks away
+                if len(found) >= k and found[k - 1]["distance"] <= ring * self.BUCKET:
+                    break
+            return found[:k]
+
+    async def aupsert(self, name: str, x: float, y: float, z: float) -> None:
+        await asyncio.to_thread(self.upsert, name, x, y, z)
+
+    async def areplace_all(self, waypoints: List[Dict[str, Any]]) -> None:
+        await asyncio.to_thread(self.replace_all, waypoints)
+
+    async def aget(self, name: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get, name)
+
+    async def aall(self) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.all)
+
+    async def awithin(self, x: float, y: float, z: float, radius: float) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.within, x, y, z, radius)
+
+    async def anearest(self, x: float, y: float, z: float, k: int) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.nearest, x, y, z, k)
+
+waypoints = WaypointStore(WAYPOINT_DB)
+
+async def sync_waypoints(force: bool = False) -> Optional[str]:
+    """Pull the bridge's waypoint list into the local store; returns an error message on failure"""
+    if not force:
+        if time.time() - await state.aget("waypoints_synced_at", 0) < WAYPOINT_SYNC_TTL:
+            return None
+        # A recent failure is reported again instead of asking the bridge on every call
+        failed = await state.aget("waypoints_sync_error")
+        if failed:
+            return failed
+    result = await make_api_request("/navigation/waypoints")
+    if not result.get("success"):
+        error = result.get("error", "Unknown error")
+        await state.aset("waypoints_sync_error", error, WAYPOINT_SYNC_RETRY)
+        return error
+    await waypoints.areplace_all([
+        {"name": w.get("name", "Unknown"), "x": w.get("position", {}).get("x", 0),
+         "y": w.get("position", {}).get("y", 0), "z": w.get("position", {}).get("z", 0)}
+        for w in result.get("data", {}).get("waypoints", [])
+    ])
+    await state.aset("waypoints_synced_at", time.time())
+    await state.adelete("waypoints_sync_error")
+    return None
+
+# ============ ENTITY TRACKER ============
+HOSTILE_MOBS = {
+    "zombie", "husk", "drowned", "zombie_villager", "skeleton", "stray", "wither_skeleton", "creeper",
+    "spider", "cave_spider", "enderman", "witch", "slime", "magma_cube", "phantom", "blaze", "ghast",
+    "pillager", "vindicator", "evoker", "ravager", "vex", "silverfish", "endermite", "guardian",
+    "elder_guardian", "shulker", "hoglin", "zoglin", "piglin_brute", "warden", "breeze", "bogged",
+}
+
+class EntityTracker:
+    """Players and mobs around the bot, kept in a uniform spatial hash of CELL-sized cubes.
+
+    The bridge feed is applied incrementally: deltas (entities + removed ids) when the bridge
+    supports a cursor, otherwise a full snapshot diffed against the table.
+    """
+    CELL = 16
+
+    def __init__(self):
+        self.entities: Dict[str, Dict[str, Any]] = {}
+        self._cells: Dict[tuple, set] = defaultdict(set)
+        self.cursor: Any = None
+        self.updated_at = 0.0
+
+    def _cell(self, x: float, y: float, z: float) -> tuple:
+        return (math.floor(x / self.CELL), math.floor(y / self.CELL), math.floor(z / self.CELL))
+
+    def upsert(self, raw: Dict[str, Any]) -> None:
+        entity_id = str(raw.get("id", raw.get("name")))
+        pos = raw.get("position") or {}
+        entity_type = raw.get("type", "unknown")
+        kind = raw.get("kind") or ("player" if entity_type == "player" else "hostile" if entity_type in HOSTILE_MOBS else "passive")
+        entity = {"id": entity_id, "name": raw.get("name", entity_type), "type": entity_type, "kind": kind,
+                  "x": pos.get("x", 0), "y": pos.get("y", 0), "z": pos.get("z", 0)}
+        cell = self._cell(entity["x"], entity["y"], entity["z"])
+        previous = self.entities.get(entity_id)
+        if previous is not None and previous["cell"] != cell:
+            self._discard(entity_id, previous["cell"])
+        entity["cell"] = cell
+        self.entities[entity_id] = entity
+        self._cells[cell].add(entity_id)
+
+    def remove(self, entity_id: str) -> None:
+        entity = self.entities.pop(entity_id, None)
+        if entity is not None:
+            self._discard(entity_id, entity["cell"])
+
+    def _discard(self, entity_id: str, cell: tuple) -> None:
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(entity_id)
+            if not members:
+                del self._cells[cell]
+
+    def apply(self, data: Dict[str, Any]) -> None:
+        incoming = data.get("entities", [])
+        if data.get("full", "removed" not in data):
+            seen = {str(raw.get("id", raw.get("name"))) for raw in incoming}
+            for entity_id in [e for e in self.entities if e not in seen]:
+                self.remove(entity_id)
+        for entity_id in data.get("removed", []):
+            self.remove(str(entity_id))
+        for raw in incoming:
+            self.upsert(raw)
+        self.cursor = data.get("cursor")
+        self.updated_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Tracked entities in the bridge's wire format, for workers that mirror the poller"""
+        return {"entities": [{"id": e["id"], "name": e["name"], "type": e["type"], "kind": e["kind"],
+                              "position": {"x": e["x"], "y": e["y"], "z": e["z"]}}
+                             for e in self.entities.values()],
+                "updated_at": self.updated_at}
+
+    def fresh(self) -> bool:
+        return ENTITY_POLL_INTERVAL > 0 and time.time() - self.updated_at <= max(4 * ENTITY_POLL_INTERVAL, 2.0)
+
+    def _cells_near(self, x: float, y: float, z: float, radius: float) -> List[tuple]:
+        """Occupied cells overlapping the cube around the point"""
+        if not math.isfinite(radius):
+            return list(self._cells)
+        cx0, cy0, cz0 = self._cell(x - radius, y - radius, z - radius)
+        cx1, cy1, cz1 = self._cell(x + radius, y + radius, z + radius)
+        # Probe the covered cells, or filter the occupied ones when there are fewer of those
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) * (cz1 - cz0 + 1) <= len(self._cells):
+            return [(cx, cy, cz) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                    for cz in range(cz0, cz1 + 1) if (cx, cy, cz) in self._cells]
+        return [cell for cell in self._cells
+                if cx0 <= cell[0] <= cx1 and cy0 <= cell[1] <= cy1 and cz0 <= cell[2] <= cz1]
+
+    def within(self, x: float, y: float, z: float, radius: float, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Entities within radius, nearest first, reading only the cells the sphere overlaps"""
+        hits = []
+        for cell in self._cells_near(x, y, z, radius):
+            for entity_id in self._cells[cell]:
+                entity = self.entities[entity_id]
+                if kind is not None and entity["kind"] != kind:
+                    continue
+                distance = math.dist((x, y, z), (entity["x"], entity["y"], entity["z"]))
+                if distance <= radius:
+                    hits.append({**entity, "distance": distance})
+        return sorted(hits, key=lambda e: e["distance"])
+
+    def nearest(self, x: float, y: float, z: float, kind: str, max_distance: float) -> Optional[Dict[str, Any]]:
+        hits = self.within(x, y, z, max_distance, kind)
+        return hits[0] if hits else None
+
+entities = EntityTracker()
+
+async def entity_poll_loop() -> None:
+    """Poll entity deltas from the bridge, backing off while it fails or lacks the endpoint.
+
+    With several workers only the holder of the poller lease polls; the others mirror its snapshot.
+    """
+    interval = ENTITY_POLL_INTERVAL
+    owner = f"{os.getpid()}"
+    while True:
+        try:
+            if await state.aacquire("lease:entity_poller", owner, HEALTH_PROBE_MAX + 10):
+                endpoint = "/entities/nearby" if entities.cursor is None else f"/entities/nearby?since={entities.cursor}"
+                result = await make_api_request(endpoint, gated=False)
+                if result.get("success"):
+                    entities.apply(result.get("data", {}))
+                    await state.aset("entities_snapshot", entities.snapshot())
+                    interval = ENTITY_POLL_INTERVAL
+                else:
+                    interval = min(interval * 2, HEALTH_PROBE_MAX)
+            else:
+                snapshot = await state.aget("entities_snapshot")
+                if snapshot and snapshot["updated_at"] > entities.updated_at:
+                    entities.apply({"entities": snapshot["entities"], "full": True})
+                    entities.updated_at = snapshot["updated_at"]
+                interval = ENTITY_POLL_INTERVAL
+        except Exception:
+            logger.exception("Entity poller iteration failed")
+            entities.cursor = None  # a half-applied delta: start over from a full snapshot
+            interval = min(interval * 2, HEALTH_PROBE_MAX)
+        await asyncio.sleep(interval)
+
+# ============ CROP TRACKER ============
+RANDOM_TICK_SECONDS = 4096 / 3 / 20  # mean gap between random ticks of one block at randomTickSpeed 3
+
+# (growth stages to maturity, chance a random tick advances a stage on hydrated farmland, on dry farmland)
+CROP_GROWTH = {
+    "wheat": (7, 1 / 3, 1 / 5),
+    "carrots": (7, 1 / 3, 1 / 5),
+    "potatoes": (7, 1 / 3, 1 / 5),
+    "beetroots": (3, 1 / 3, 1 / 5),
+    "melon_stem": (8, 1 / 3, 1 / 5),  # 7 stem stages, then a fruit attempt
+    "pumpkin_stem": (8, 1 / 3, 1 / 5),
+    "nether_wart": (3, 0.1, 0.1),
+    "sweet_berry_bush": (2, 0.2, 0.2),
+}
+CROP_ALIASES = {"carrot": "carrots", "potato": "potatoes", "beetroot": "beetroots", "melon": "melon_stem",
+                "pumpkin": "pumpkin_stem", "melon_seeds": "melon_stem", "pumpkin_seeds": "pumpkin_stem",
+                "wheat_seeds": "wheat", "beetroot_seeds": "beetroots", "sweet_berries": "sweet_berry_bush"}
+
+def has_growth_model(crop: str) -> bool:
+    return CROP_ALIASES.get(crop, crop) in CROP_GROWTH
+
+def crop_growth_seconds(crop: str, hydrated: bool) -> tuple:
+    """Mean and 90th percentile seconds to maturity; stage advances arrive as a Poisson process"""
+    crop = CROP_ALIASES.get(crop, crop)
+    if crop not in CROP_GROWTH:
+        raise ValueError(f"No growth model for {crop}")
+    stages, wet_chance, dry_chance = CROP_GROWTH[crop]
+    rate = (wet_chance if hydrated else dry_chance) / RANDOM_TICK_SECONDS
+    mean = stages / rate
+    return mean, mean + 1.28 * math.sqrt(stages) / rate
+
+class CropTracker:
+    """Planted plots persisted in SQLite, with maturity predicted from the game's growth rates.
+
+    Crops only grow in loaded chunks, so predictions assume a player stays near the farm.
+    Code on the event loop uses the async `a*` variants, which run the queries in a thread.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS plots (
+            x INTEGER NOT NULL, y INTEGER NOT NULL, z INTEGER NOT NULL, crop TEXT NOT NULL,
+            size INTEGER NOT NULL, planted_at REAL NOT NULL, mature_at REAL NOT NULL, ready_at REAL NOT NULL,
+            PRIMARY KEY (x, y, z))""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS plots_ready ON plots (ready_at)")
+
+    def plant(self, x: float, y: float, z: float, crop: str, size: int, hydrated: bool = True,
+              planted_at: Optional[float] = None) -> Dict[str, Any]:
+        planted_at = time.time() if planted_at is None else planted_at
+        mean, p90 = crop_growth_seconds(crop, hydrated)
+        row = (round(x), round(y), round(z), crop, size, planted_at, planted_at + mean, planted_at + p90)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO plots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+        return self._plot(row)
+
+    def remove(self, plot: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM plots WHERE x = ? AND y = ? AND z = ?", (plot["x"], plot["y"], plot["z"]))
+
+    def postpone(self, plot: Dict[str, Any], seconds: float) -> None:
+        """Push back a plot that was visited before it had grown: due again in seconds from now"""
+        due = time.time() + seconds
+        with self._lock:
+            self._conn.execute("UPDATE plots SET mature_at = MAX(mature_at, ?), ready_at = MAX(ready_at, ?) WHERE x = ? AND y = ? AND z = ?",
+                               (due, due, plot["x"], plot["y"], plot["z"]))
+
+    @staticmethod
+    def _plot(row: tuple) -> Dict[str, Any]:
+        return dict(zip(("x", "y", "z", "crop", "size", "planted_at", "mature_at", "ready_at"), row))
+
+    def ready(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Plots predicted mature with 90% confidence"""
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM plots WHERE ready_at <= ? ORDER BY ready_at", (now,)).fetchall()
+        return [self._plot(row) for row in rows]
+
+    def upcoming(self, until: float, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM plots WHERE ready_at > ? AND ready_at <= ? ORDER BY ready_at", (now, until)).fetchall()
+        return [self._plot(row) for row in rows]
+
+    def next_due(self, now: Optional[float] = None) -> Optional[float]:
+        now = time.time() if now is None else now
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(ready_at) FROM plots WHERE ready_at > ?", (now,)).fetchone()
+        return row[0]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plots").fetchone()[0]
+
+    async def aplant(self, x: float, y: float, z: float, crop: str, size: int, hydrated: bool = True) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.plant, x, y, z, crop, size, hydrated)
+
+    async def aremove(self, plot: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self.remove, plot)
+
+    async def apostpone(self, plot: Dict[str, Any], seconds: float) -> None:
+        await asyncio.to_thread(self.postpone, plot, seconds)
+
+    async def aready(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.ready, now)
+
+    async def aupcoming(self, until: float, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.upcoming, until, now)
+
+    async def anext_due(self, now: Optional[float] = None) -> Optional[float]:
+        return await asyncio.to_thread(self.next_due, now)
+
+    async def acount(self) -> int:
+        return await asyncio.to_thread(self.count)
+
+crops = CropTracker(FARM_DB)
+
+def visit_route(start: Dict[str, float], plots: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Order positions (plots, furnaces) into a short open route from start: nearest neighbour, then 2-opt"""
+    def dist(a: Dict[str, float], b: Dict[str, float]) -> float:
+        return math.dist((a["x"], a["y"], a["z"]), (b["x"], b["y"], b["z"]))
+    
+    route, remaining = [], list(plots)
+    here = start
+    while remaining:
+        closest = min(remaining, key=lambda plot: dist(here, plot))
+        remaining.remove(closest)
+        route.append(closest)
+        here = closest
+    
+    improved = True
+    while improved:
+        improved = False
+        for i in range(len(route) - 1):
+            before = start if i == 0 else route[i - 1]
+            for j in range(i + 1, len(route)):
+                after = route[j + 1] if j + 1 < len(route) else None
+                # Reversing route[i..j] only changes the two edges at its ends
+                old = dist(before, route[i]) + (dist(route[j], after) if after else 0)
+                new = dist(before, route[j]) + (dist(route[i], after) if after else 0)
+                if new < old - 1e-9:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    improved = True
+    return route
+
+# ============ RESOURCE LOCKS ============
+class ResourceBusy(Exception):
+    """Raised when a resource could not be acquired before the lock timeout"""
+
+class LockManager:
+    """Named locks over the bot's resources, so concurrent sessions queue instead of issuing conflicting goals.
+
+    Each resource is an asyncio lock inside the process plus a lease in the shared state backend,
+    renewed while held, so workers of a multi-worker server also exclude each other.
+    """
+    RESOURCES = ("movement", "inventory", "crafting_table", "chat")
+
+    def __init__(self, backend: StateBackend):
+        self._backend = backend
+        self._owner = f"{os.getpid()}"
+        self._local = {name: asyncio.Lock() for name in self.RESOURCES}
+        self.metrics = {name: {"acquired": 0, "timeouts": 0, "waiting": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+                        for name in self.RESOURCES}
+
+    async def _acquire(self, name: str, deadline: Optional[float]) -> None:
+        remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+        try:
+            await asyncio.wait_for(self._local[name].acquire(), remaining)
+        except asyncio.TimeoutError:
+            raise ResourceBusy(f"{name} is busy") from None
+        try:
+            while not await self._backend.aacquire(f"lock:{name}", self._owner, LOCK_LEASE):
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise ResourceBusy(f"{name} is held by another worker")
+                await asyncio.sleep(0.05)
+        except BaseException:
+            # Cancelled or timed out half way: the lease may have been granted in the worker thread
+            await self._release(name)
+            raise
+
+    def locked(self, name: str) -> bool:
+        return self._local[name].locked()
+
+    async def _release(self, name: str) -> None:
+        self._local[name].release()
+        # Shielded so a cancelled tool call still frees the lease for the other workers
+        with anyio.CancelScope(shield=True):
+            await self._backend.arelease(f"lock:{name}", self._owner)
+
+    async def _renew(self, names: List[str]) -> None:
+        while True:
+            await asyncio.sleep(LOCK_LEASE / 3)
+            for name in names:
+                await self._backend.aacquire(f"lock:{name}", self._owner, LOCK_LEASE)
+
+    @asynccontextmanager
+    async def hold(self, *names: str, timeout: Optional[float] = None):
+        """Hold every named resource for the duration of the block, acquired in a fixed order"""
+        timeout = LOCK_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        held: List[str] = []
+        renewer = None
+        try:
+            for name in sorted(set(names)):
+                metrics = self.metrics[name]
+                metrics["waiting"] += 1
+                t0 = time.perf_counter()
+                try:
+                    await self._acquire(name, deadline)
+                except ResourceBusy:
+                    metrics["timeouts"] += 1
+                    raise
+                finally:
+                    metrics["waiting"] -= 1
+                waited = (time.perf_counter() - t0) * 1000
+                metrics["acquired"] += 1
+                metrics["wait_ms_total"] += waited
+                metrics["wait_ms_max"] = max(metrics["wait_ms_max"], waited)
+                held.append(name)
+            renewer = asyncio.create_task(self._renew(held))
+            yield
+        finally:
+            if renewer is not None:
+                renewer.cancel()
+            for name in reversed(held):
+                await self._release(name)
+
+locks = LockManager(state)
+
+def uses_resources(*names: str):
+    """Serialize a mutating tool on the named resources; read-only tools are left undecorated"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                async with locks.hold(*names):
+                    return await func(*args, **kwargs)
+            except ResourceBusy as e:
+                return f"⏳ Bot busy: {e}, try again later"
+        return wrapper
+    return decorator
+
+# ============ CANCELLATION ============
+STOP_TIMEOUT = 5.0  # seconds allowed for the stop request of a cancelled tool call
+
+class ToolCallTracker:
+    """In-flight calls of the long-running tools and what happened when clients cancelled them"""
+
+    def __init__(self):
+        self._next_id = 0
+        self.active: Dict[int, Dict[str, Any]] = {}
+        self.metrics: Dict[str, Dict[str, int]] = defaultdict(lambda: {"calls": 0, "cancelled": 0, "stops_sent": 0, "stops_failed": 0})
+
+    def begin(self, tool: str, stop_endpoint: str) -> int:
+        self._next_id += 1
+        self.active[self._next_id] = {"tool": tool, "stop": stop_endpoint, "started": time.time()}
+        self.metrics[tool]["calls"] += 1
+        return self._next_id
+
+    def end(self, call_id: int) -> None:
+        self.active.pop(call_id, None)
+
+    async def stop(self, call_id: int) -> None:
+        """Send the stop endpoint of a cancelled call; runs shielded from the cancellation itself"""
+        call = self.active[call_id]
+        metrics = self.metrics[call["tool"]]
+        metrics["cancelled"] += 1
+        with anyio.move_on_after(STOP_TIMEOUT, shield=True):
+            if call["stop"] == "/movement/stop":
+                await clear_movement_target()
+            # Not gated: the stop must get through even when the bridge is saturated
+            result = await make_api_request(call["stop"], "POST", gated=False)
+            if result.get("success"):
+                metrics["stops_sent"] += 1
+                return
+        metrics["stops_failed"] += 1
+        logger.warning("Stop %s after cancelled %s failed", call["stop"], call["tool"])
+
+tool_calls = ToolCallTracker()
+
+def stops_on_cancel(stop_endpoint: str):
+    """Send stop_endpoint when the client cancels the tool call, so the bot drops the abandoned goal.
+
+    Goes under uses_resources so the locks are only released once the stop went out.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            call_id = tool_calls.begin(func.__name__, stop_endpoint)
+            try:
+                return await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                await tool_calls.stop(call_id)
+                raise
+            finally:
+                tool_calls.end(call_id)
+        return wrapper
+    return decorator
+
+# ============ SMELTING JOBS ============
+SMELT_SECONDS = {"furnace": 10.0, "blast_furnace": 5.0, "smoker": 5.0}  # per item at 20 TPS
+FUEL_VALUE = {"coal": 8, "charcoal": 8, "coal_block": 80, "blaze_rod": 12, "lava_bucket": 100, "dried_kelp_block": 20}
+FURNACE_SLOT = 64  # items one input slot holds
+BLAST_FURNACE_ITEMS = {"raw_iron", "raw_gold", "raw_copper", "ancient_debris"}
+SMOKER_ITEMS = {"beef", "porkchop", "chicken", "mutton", "rabbit", "cod", "salmon", "potato", "kelp"}
+SMELT_JOB_TTL = 86400  # seconds a job stays readable in the shared state
+SMELT_CANCEL_POLL = 5.0  # seconds between checks for a cancel requested by another worker
+SMELT_HEARTBEAT = 10.0  # seconds between saves of a running job, even when nothing changed
+SMELT_ORPHANED_AFTER = 3 * SMELT_HEARTBEAT  # a running job not saved for this long lost its worker
+
+def furnace_accepts(furnace_type: str, item: str) -> bool:
+    """Blast furnaces only take ores and metal gear, smokers only food; a plain furnace takes anything"""
+    item = item.removeprefix("minecraft:")
+    if furnace_type == "blast_furnace":
+        return item.endswith("_ore") or item in BLAST_FURNACE_ITEMS or item.startswith(("iron_", "golden_", "chainmail_"))
+    if furnace_type == "smoker":
+        return item in SMOKER_ITEMS
+    return True
+
+def fuel_needed(fuel: str, items: int) -> int:
+    """Fuel items to smelt items; planks and logs burn for 1.5 items, unknown fuels are treated as coal"""
+    value = FUEL_VALUE.get(fuel, 1.5 if fuel.endswith(("_planks", "_log")) else 8)
+    return math.ceil(items / value)
+
+class SmeltJob:
+    """One batch spread over several furnaces; furnaces get refilled from the batch as they finish"""
+    FIELDS = ("id", "item", "count", "fuel", "pending", "collected", "started_at", "finished_at", "error", "furnaces",
+              "owner", "heartbeat")
+
+    def __init__(self, job_id: str, item: str, count: int, fuel: str, furnaces: List[Dict[str, Any]]):
+        self.id = job_id
+        self.item = item
+        self.count = count
+        self.fuel = fuel
+        self.pending = count  # not loaded into any furnace yet
+        self.collected = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.owner = os.getpid()  # worker running the job
+        self.heartbeat = self.started_at  # last save by that worker
+        self.furnaces = [{"type": f.get("type", "furnace"), "x": f["position"]["x"], "y": f["position"]["y"], "z": f["position"]["z"],
+                          "status": "queued", "load": 0, "loaded_at": None, "finish_at": None, "collected": 0}
+                         for f in furnaces]
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SmeltJob":
+        job = cls.__new__(cls)
+        for key in cls.FIELDS:
+            setattr(job, key, data.get(key))
+        job.task = None
+        return job
+
+    def orphaned(self, now: float) -> bool:
+        """Unfinished, but its worker stopped saving it (restarted or killed mid-job)"""
+        return self.finished_at is None and now - (self.heartbeat or self.started_at) > SMELT_ORPHANED_AFTER
+
+    def plan(self) -> None:
+        """Give each furnace its first load, greedily onto the furnace that would finish earliest"""
+        remaining = self.pending
+        while remaining:
+            open_furnaces = [f for f in self.furnaces if f["load"] < FURNACE_SLOT]
+            if not open_furnaces:
+                break
+            best = min(open_furnaces, key=lambda f: (f["load"] + 1) * SMELT_SECONDS.get(f["type"], 10.0))
+            best["load"] += 1
+            remaining -= 1
+
+    def smelted(self, furnace: Dict[str, Any], now: float) -> int:
+        """Items of the furnace's current load estimated done"""
+        if furnace["status"] != "smelting":
+            return 0
+        return min(furnace["load"], int((now - furnace["loaded_at"]) / SMELT_SECONDS.get(furnace["type"], 10.0)))
+
+    def eta(self) -> float:
+        """Rough finish time, assuming the pending items are shared evenly once the furnaces free up"""
+        if self.finished_at is not None:
+            return self.finished_at
+        now = time.time()
+        busy = [f["finish_at"] if f["status"] == "smelting" else now + f["load"] * SMELT_SECONDS.get(f["type"], 10.0)
+                for f in self.furnaces if f["status"] in ("smelting", "queued") and f["load"]]
+        start = max(busy) if busy else now
+        # Planned loads of queued furnaces are still counted as pending
+        unplanned = self.pending - sum(f["load"] for f in self.furnaces if f["status"] == "queued")
+        if unplanned <= 0:
+            return start
+        per_item = min(SMELT_SECONDS.get(f["type"], 10.0) for f in self.furnaces)
+        return start + math.ceil(unplanned / len(self.furnaces)) * per_item
+
+class SmeltingJobs:
+    """Runs smelting jobs in the background: load every furnace, then collect and refill each as it finishes.
+
+    Each load or collect takes the movement and inventory locks, so other tools interleave with a job.
+    A job runs in the worker that started it and saves its state after every step and on a heartbeat,
+    so any worker can report on it, ask for it to be cancelled, or tell that its worker is gone.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, SmeltJob] = {}  # jobs running in this worker
+        self._next_id = 0
+
+    async def create(self, item: str, count: int, fuel: str, furnaces: List[Dict[str, Any]]) -> SmeltJob:
+        self._next_id += 1
+        job = SmeltJob(f"smelt-{os.getpid()}-{self._next_id}", item, count, fuel, furnaces)
+        job.plan()
+        await self._save(job)
+        self.jobs[job.id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    async def get(self, job_id: str) -> Optional[SmeltJob]:
+        data = await state.aget(f"smelt_job:{job_id}")
+        return SmeltJob.from_dict(data) if data else None
+
+    async def all(self) -> List[SmeltJob]:
+        jobs = [SmeltJob.from_dict(data) for data in (await state.ascan("smelt_job:")).values()]
+        return sorted(jobs, key=lambda job: job.started_at)
+
+    async def cancel(self, job_id: str) -> None:
+        """Stop loading and collecting; items already in the furnaces stay there"""
+        await state.aset(f"smelt_cancel:{job_id}", True, SMELT_JOB_TTL)
+        job = self.jobs.get(job_id)
+        if job is not None and job.task is not None:
+            job.task.cancel()
+
+    async def abandon(self, job: SmeltJob) -> int:
+        """Close an orphaned job nobody is running any more; returns the items left in the furnaces"""
+        await state.aset(f"smelt_cancel:{job.id}", True, SMELT_JOB_TTL)  # in case its worker comes back
+        loaded = [f for f in job.furnaces if f["status"] == "smelting"]
+        for furnace in loaded:
+            furnace["status"] = "cancelled"
+        left = sum(f["load"] for f in loaded)
+        job.error = f"Orphaned: worker {job.owner} stopped {_ago(job.heartbeat)} with {left} items left in the furnaces"
+        job.finished_at = time.time()
+        await state.aset(f"smelt_job:{job.id}", job.to_dict(), SMELT_JOB_TTL)
+        return left
+
+    async def _save(self, job: SmeltJob) -> None:
+        job.heartbeat = time.time()
+        await state.aset(f"smelt_job:{job.id}", job.to_dict(), SMELT_JOB_TTL)
+
+    async def _heartbeat(self, job: SmeltJob) -> None:
+        """Keep saving the job while a step takes long (walking to a furnace, waiting on a lock)"""
+        while True:
+            await asyncio.sleep(SMELT_HEARTBEAT)
+            try:
+                await self._save(job)
+            except Exception:
+                logger.exception("Smelting job %s heartbeat failed", job.id)
+
+    async def _cancelled(self, job: SmeltJob) -> bool:
+        return bool(await state.aget(f"smelt_cancel:{job.id}"))
+
+    async def _wait_until(self, job: SmeltJob, until: float) -> bool:
+        """Sleep until the given time; False when the job was cancelled meanwhile"""
+        while time.time() < until:
+            await asyncio.sleep(min(until - time.time(), SMELT_CANCEL_POLL))
+            if await self._cancelled(job):
+                return False
+        return not await self._cancelled(job)
+
+    async def _furnace_call(self, endpoint: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        while True:
+            try:
+                async with locks.hold("movement", "inventory"):
+                    return await make_api_request(endpoint, "POST", body)
+            except ResourceBusy:
+                await asyncio.sleep(5)
+
+    async def _load(self, job: SmeltJob, furnace: Dict[str, Any], amount: int, refill: bool = False) -> None:
+        result = await self._furnace_call("/crafting/furnace/load", {
+            "x": furnace["x"], "y": furnace["y"], "z": furnace["z"], "itemType": job.item, "count": amount,
+            "fuelType": job.fuel, "fuelCount": fuel_needed(job.fuel, amount)})
+        if not result.get("success"):
+            error = result.get("error", "Unknown error")
+            if refill:
+                # Most likely out of input or fuel: the other furnaces would fail the same way
+                job.error = f"Stopped refilling with {job.pending} items left: {error}"
+                job.pending = 0
+            else:
+                furnace.update(status="failed", load=0, error=error)
+        else:
+            loaded = result.get("data", {}).get("loaded", amount)
+            job.pending -= loaded
+            now = time.time()
+            furnace.update(status="smelting", load=loaded, loaded_at=now,
+                           finish_at=now + loaded * SMELT_SECONDS.get(furnace["type"], 10.0))
+        await self._save(job)
+
+    async def _run(self, job: SmeltJob) -> None:
+        heartbeat = asyncio.get_running_loop().create_task(self._heartbeat(job))
+        try:
+            origin = await current_position()
+            order = visit_route(origin, job.furnaces) if origin is not None else job.furnaces
+            for furnace in order:
+                if await self._cancelled(job):
+                    raise asyncio.CancelledError
+                if furnace["load"]:
+                    await self._load(job, furnace, furnace["load"])
+            
+            while True:
+                smelting = [f for f in job.furnaces if f["status"] == "smelting"]
+                if not smelting:
+                    break
+                furnace = min(smelting, key=lambda f: f["finish_at"])
+                if not await self._wait_until(job, furnace["finish_at"]):
+                    raise asyncio.CancelledError
+                result = await self._furnace_call("/crafting/furnace/collect", {"x": furnace["x"], "y": furnace["y"], "z": furnace["z"]})
+                if not result.get("success"):
+                    furnace.update(status="failed", error=result.get("error", "Unknown error"))
+                    await self._save(job)
+                    continue
+                data = result.get("data", {})
+                collected = data.get("collected", 0)
+                furnace["collected"] += collected
+                job.collected += collected
+                remaining = data.get("remaining", 0)
+                if remaining:
+                    if not collected:
+                        # Nothing smelted since the last visit: out of fuel, or the furnace rejects the item
+                        reason = "out of fuel" if not data.get("fuelLeft", 0) else "no progress"
+                        furnace.update(status="failed", error=f"{reason} with {remaining} items left")
+                    else:
+                        # Smelted slower than estimated (lag, chunk unloaded): come back for the rest
+                        furnace.update(load=remaining, finish_at=time.time() + remaining * SMELT_SECONDS.get(furnace["type"], 10.0))
+                    await self._save(job)
+                    continue
+                furnace.update(status="done", load=0)
+                await self._save(job)
+                if job.pending:
+                    await self._load(job, furnace, min(job.pending, FURNACE_SLOT), refill=True)
+            
+            if job.pending and job.error is None:
+                job.error = f"{job.pending} items could not be loaded, every furnace failed"
+        except asyncio.CancelledError:
+            loaded = [f for f in job.furnaces if f["status"] == "smelting"]
+            for furnace in loaded:
+                furnace["status"] = "cancelled"
+            job.error = f"Cancelled with {sum(f['load'] for f in loaded)} items left in the furnaces"
+        except Exception as e:
+            job.error = f"Job failed: {str(e)}"
+        finally:
+            heartbeat.cancel()
+            job.finished_at = time.time()
+            self.jobs.pop(job.id, None)
+            await self._save(job)
+
+smelting = SmeltingJobs()
+
+# ============ PROFILING ============
+class SamplingProfiler:
+    """Samples the event loop thread's Python stack from a side thread.
+
+    Writes a speedscope profile and a folded-stacks file (flamegraph.pl, inferno) when stopped.
+    In tool mode samples are only kept while a call of that tool is in flight.
+    """
+
+    def __init__(self, thread_id: int, interval: float, seconds: Optional[float] = None,
+                 tool: Optional[str] = None, calls: int = 0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.seconds = seconds
+        self.tool = tool
+        self.remaining_calls = calls
+        self.active_calls = 0
+        self.samples: Counter = Counter()
+        self.files: List[str] = []
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="mcp-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive() and not self._stop.is_set()
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + (self.seconds or PROFILE_MAX_SECONDS)
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= deadline:
+                break
+            if self.tool is not None and not self.active_calls:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_qualname, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            self.samples[tuple(reversed(stack))] += 1
+        self._write()
+
+    def _write(self) -> None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        label = f"tool-{self.tool}" if self.tool else f"{self.seconds:g}s"
+        base = os.path.join(PROFILE_DIR, f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}-{label}")
+        frames: Dict[tuple, int] = {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            samples.append([frames.setdefault(frame, len(frames)) for frame in stack])
+            weights.append(count * self.interval)
+        speedscope = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [{"name": name, "file": file, "line": line} for name, file, line in frames]},
+            "profiles": [{
+                "type": "sampled", "name": f"minecraft-mcp {label}", "unit": "seconds",
+                "startValue": 0, "endValue": sum(weights), "samples": samples, "weights": weights,
+            }],
+            "exporter": "minecraft-mcp",
+        }
+        with open(base + ".speedscope.json", "w", encoding="utf-8") as f:
+            json.dump(speedscope, f)
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for stack, count in self.samples.items():
+                f.write(";".join(f"{name} ({os.path.basename(file)}:{line})" for name, file, line in stack) + f" {count}\n")
+        self.files = [base + ".speedscope.json", base + ".folded"]
+        logger.info("Profile written: %s (%d samples)", base, sum(self.samples.values()))
+
+class ProfilingMiddleware(Middleware):
+    """Counts in-flight calls of the profiled tool; installed on first use of tool mode only"""
+
+    async def on_call_tool(self, context, call_next):
+        current = profiler
+        if current is None or current.tool != context.message.name or not current.running:
+            return await call_next(context)
+        current.active_calls += 1
+        try:
+            return await call_next(context)
+        finally:
+            current.active_calls -= 1
+            current.remaining_calls -= 1
+            if current.remaining_calls <= 0:
+                current.stop()
+
+class LoopLagMonitor:
+    """Heartbeat task on the loop plus a watchdog thread that logs the loop's stack when it stalls"""
+
+    def __init__(self, threshold: float, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        thread_id = threading.get_ident()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        threading.Thread(target=self._watch, args=(thread_id,), name="mcp-loop-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self.max_lag = max(self.max_lag, now - expected)
+            self._beat = now
+
+    def _watch(self, thread_id: int) -> None:
+        reported = 0.0
+        while not self._stop.wait(self.threshold / 2):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled < self.threshold or self._beat == reported:
+                continue
+            reported = self._beat
+            self.stalls += 1
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None and len(stack) < 12:
+                stack.append(f"{frame.f_code.co_qualname} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            logger.warning("Event loop blocked for %.0f ms in: %s", stalled * 1000, " <- ".join(stack))
+
+profiler: Optional[SamplingProfiler] = None
+lag_monitor: Optional[LoopLagMonitor] = None
+_profiling_middleware_installed = False
+
+def _admin_denied(request) -> Optional[JSONResponse]:
+    if MCP_ADMIN_TOKEN and request.headers.get("Authorization") != f"Bearer {MCP_ADMIN_TOKEN}":
+        return JSONResponse(status_code=401, content={"success": False, "error": "Unauthorized"})
+    return None
+
+def _profiling_status() -> Dict[str, Any]:
+    return {
+        "profiler": None if profiler is None else {
+            "running": profiler.running, "tool": profiler.tool, "seconds": profiler.seconds,
+            "remainingCalls": profiler.remaining_calls if profiler.tool else None,
+            "samples": sum(profiler.samples.values()), "files": profiler.files,
+        },
+        "lagMonitor": None if lag_monitor is None else {
+            "thresholdMs": lag_monitor.threshold * 1000, "maxLagMs": round(lag_monitor.max_lag * 1000, 1),
+            "stalls": lag_monitor.stalls,
+        },
+    }
+
+async def _tool_exists(name: str) -> bool:
+    # fastmcp 2.x raises NotFoundError for an unknown name, later versions return None
+    try:
+        return await mcp.get_tool(name) is not None
+    except NotFoundError:
+        return False
+
+@mcp.custom_route("/admin/profile", methods=["GET", "POST"])
+async def admin_profile(request):
+    """Start a profile: {"seconds": 10} or {"tool": "move_bot", "calls": 5}, optional "intervalMs".
+    Stop it early (profile files are still written): {"stop": true}.
+    Toggle the loop lag monitor: {"lagMonitor": true, "thresholdMs": 100}. GET returns the status.
+    """
+    global profiler, lag_monitor, _profiling_middleware_installed
+    denied = _admin_denied(request)
+    if denied:
+        return denied
+    if request.method == "GET":
+        return JSONResponse(content={"success": True, "data": _profiling_status()})
+    
+    def bad_request(error: str) -> JSONResponse:
+        return JSONResponse(status_code=400, content={"success": False, "error": error})
+    
+    try:
+        body = await request.json()
+        interval = float(body.get("intervalMs", 5)) / 1000
+        seconds = float(body["seconds"]) if "seconds" in body else None
+        calls = int(body.get("calls", 1))
+        threshold = float(body.get("thresholdMs", 100)) / 1000
+    except (ValueError, TypeError, AttributeError):
+        return bad_request("Expected a JSON object with numeric seconds, calls, intervalMs and thresholdMs")
+    if interval <= 0 or threshold <= 0 or calls <= 0:
+        return bad_request("intervalMs, thresholdMs and calls must be positive")
+    if seconds is not None and not 0 < seconds <= PROFILE_MAX_SECONDS:
+        return bad_request(f"seconds must be between 0 and {PROFILE_MAX_SECONDS:g}")
+    if "tool" in body and not isinstance(body["tool"], str):
+        return bad_request("tool must be a tool name")
+    if body.get("tool") and not await _tool_exists(body["tool"]):
+        return bad_request(f"Unknown tool: {body['tool']}")
+    
+    if body.get("stop") and profiler is not None:
+        profiler.stop()
+    
+    if "lagMonitor" in body:
+        if lag_monitor is not None:
+            lag_monitor.stop()
+            lag_monitor = None
+        if body["lagMonitor"]:
+            lag_monitor = LoopLagMonitor(threshold)
+            lag_monitor.start()
+    
+    if seconds is not None or body.get("tool"):
+        if profiler is not None and profiler.running:
+            return JSONResponse(status_code=409, content={"success": False, "error": "A profile is already running"})
+        if body.get("tool"):
+            if not _profiling_middleware_installed:
+                mcp.add_middleware(ProfilingMiddleware())
+                _profiling_middleware_installed = True
+            profiler = SamplingProfiler(threading.get_ident(), interval, tool=body["tool"], calls=calls)
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), interval, seconds=seconds)
+        profiler.start()
+    
+    return JSONResponse(content={"success": True, "data": _profiling_status()})
 
 # ============ CORE STATUS & HEALTH ============
 @mcp.tool()
@@ -75,36 +1888,102 @@ async def get_bot_status() -> str:
 
 @mcp.tool()
 async def check_api_health() -> str:
-    """Check if the bot API is running and accessible"""
-    result = await make_api_request("/health")
+    """Check if the bot API is running and accessible (cached from the background prober)"""
+    start_background_tasks()
+    live = await state.aget("liveness") or await probe_health()
+    interval = await state.aget("liveness_interval", HEALTH_PROBE_MIN)
+    
+    server_icon = "🟢" if live["bridge"] and live["server"] == "online" else "🔴"
+    bot_icon = "🟢" if live["bot"] else "🔴"
+    health_text = f"""🏥 API Health Check:
+{server_icon} Server: {live['server']}
+{bot_icon} Bot: {live['botStatus'] if live['bridge'] else 'unknown'}
+🕒 Last probe: {_ago(live['checked_at'])}, last success: {_ago(live.get('last_ok'))}, next in {interval:g}s"""
+    
+    if live.get("message"):
+        health_text += f"\n📝 Message: {live['message']}"
+    if live.get("error"):
+        health_text += f"\n❌ Error: {live['error']}"
+    return health_text
+
+@mcp.tool()
+async def get_transport_stats() -> str:
+    """Get per-endpoint bytes on the wire and decode time for bridge responses"""
+    if not transport_stats:
+        return "📡 No bridge responses decoded yet"
     
-    if result.get("success"):
-        data = result.get("data", {})
-        server_status = data.get("server", "unknown")
-        bot_status = data.get("bot", "unknown")
-        
-        server_icon = "🟢" if server_status == "online" else "🔴"
-        bot_icon = "🟢" if bot_status == "connected" else "🔴"
-        
-        return f"""🏥 API Health Check:
-{server_icon} Server: {server_status}
-{bot_icon} Bot: {bot_status}
-📝 Message: {result.get('message', 'No message')}"""
-    else:
-        return f"❌ API Health Check Failed: {result.get('error', 'Cannot reach bot API')}"
+    codec_info = f"request codec {request_codec.content_type}, json via {'orjson' if orjson is not None else 'stdlib'}, accept-encoding {ACCEPT_ENCODING}"
+    stats_text = f"📡 Transport Stats ({codec_info}):\n"
+    for endpoint, stats in sorted(transport_stats.items(), key=lambda item: -item[1]["wire_bytes"]):
+        calls = stats["calls"]
+        ratio = stats["body_bytes"] / stats["wire_bytes"] if stats["wire_bytes"] else 1.0
+        stats_text += (f"• {endpoint}: {calls} calls, {stats['wire_bytes'] / calls:.0f} B/call on wire "
+                       f"(x{ratio:.1f} compression), decode {stats['decode_ms'] / calls:.3f} ms/call\n")
+    
+    return stats_text.strip()
+
+@mcp.tool()
+async def get_lock_metrics() -> str:
+    """Get acquisitions, timeouts and wait times for the bot resource locks"""
+    metrics_text = f"🔒 Resource Locks (timeout {LOCK_TIMEOUT:g}s):\n"
+    for name, metrics in locks.metrics.items():
+        acquired = metrics["acquired"]
+        average = metrics["wait_ms_total"] / acquired if acquired else 0.0
+        state_icon = "🔴" if locks.locked(name) else "🟢"
+        metrics_text += (f"{state_icon} {name}: {acquired} acquired, {metrics['waiting']} waiting, {metrics['timeouts']} timeouts, "
+                         f"wait avg {average:.1f} ms / max {metrics['wait_ms_max']:.1f} ms\n")
+    
+    return metrics_text.strip()
+
+@mcp.tool()
+async def get_admission_stats() -> str:
+    """Get the adaptive in-flight limit, queue depth and shed calls toward the bridge"""
+    controller = get_admission()
+    metrics = controller.metrics
+    baseline = f"{controller.min_rtt * 1000:.1f} ms" if controller.min_rtt is not None else "n/a"
+    smoothed = f"{controller.srtt * 1000:.1f} ms" if controller.srtt is not None else "n/a"
+    return (f"🚦 Bridge Admission ({BOT_API_BASE}):\n"
+            f"• Limit: {int(controller.limit)} in flight (max {controller.max_inflight}), queue max {controller.max_queue}, "
+            f"queue timeout {controller.queue_timeout:g}s\n"
+            f"• Now: {controller.inflight} in flight, {len(controller.waiters)} queued\n"
+            f"• Latency: baseline {baseline}, smoothed {smoothed}\n"
+            f"• Calls: {metrics['admitted']} admitted, {metrics['queued']} queued, {metrics['shed']} shed (queue full), "
+            f"{metrics['timed_out']} shed (queue timeout), queue wait max {metrics['wait_ms_max']:.1f} ms")
+
+@mcp.tool()
+async def get_tool_calls() -> str:
+    """Get the long-running tool calls in flight and how client cancellations were handled"""
+    calls_text = "🧵 Tool Calls:\n"
+    now = time.time()
+    for call in tool_calls.active.values():
+        calls_text += f"▶️ {call['tool']}: running {now - call['started']:.1f}s (stop via {call['stop']})\n"
+    if not tool_calls.active:
+        calls_text += "• None in flight\n"
+    for tool, metrics in sorted(tool_calls.metrics.items()):
+        if metrics["cancelled"]:
+            calls_text += (f"• {tool}: {metrics['calls']} calls, {metrics['cancelled']} cancelled, "
+                           f"{metrics['stops_sent']} stopped, {metrics['stops_failed']} stop failures\n")
+    
+    return calls_text.strip()
 
 # ============ MOVEMENT & NAVIGATION ============
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def move_bot(x: float, y: float, z: float) -> str:
     """Move bot to specific coordinates using the correct endpoint"""
+    await set_movement_target(x, y, z, f"({x:.1f}, {y:.1f}, {z:.1f})")
     result = await make_api_request("/movement/moveTo", "POST", {"x": x, "y": y, "z": z})
     
     if result.get("success"):
         return f"✅ {result.get('message', 'Movement completed')}"
     else:
+        await clear_movement_target()
         return f"❌ Movement failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def follow_player(player_name: str = "", distance: float = 3.0, continuous: bool = False) -> str:
     """Make bot follow a specific player. If no player_name provided, follows nearest player"""
     result = await make_api_request("/movement/follow", "POST", {
@@ -123,6 +2002,8 @@ async def follow_player(player_name: str = "", distance: float = 3.0, continuous
         return f"❌ Follow failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def follow_nearest_player(distance: float = 3.0, continuous: bool = False) -> str:
     """Make bot follow the nearest available player automatically"""
     result = await make_api_request("/movement/follow", "POST", {
@@ -139,9 +2020,11 @@ async def follow_nearest_player(distance: float = 3.0, continuous: bool = False)
 @mcp.tool()
 async def stop_movement() -> str:
     """Stop all bot movement"""
-    result = await make_api_request("/movement/stop", "POST")
+    # Never queued or shed: a stop is what relieves an overloaded bot
+    result = await make_api_request("/movement/stop", "POST", gated=False)
     
     if result.get("success"):
+        await clear_movement_target()
         return f"✅ {result.get('message', 'Movement stopped')}"
     else:
         return f"❌ Stop failed: {result.get('error', 'Unknown error')}"
@@ -163,6 +2046,47 @@ async def get_position() -> str:
 • Pitch: {data.get('pitch', 0):.2f}°"""
 
 @mcp.tool()
+async def get_movement_stats(window_seconds: float = 30.0) -> str:
+    """Get speed, distance travelled and stuck detection from the background position samples"""
+    start_background_tasks()
+    samples = positions.window(window_seconds)
+    if len(samples) < 2:
+        return f"📈 Not enough position samples yet ({len(samples)}), sampling every {POSITION_SAMPLE_INTERVAL:g}s"
+    
+    stats = movement_stats(samples)
+    last = samples[-1]
+    status = "🛑 Stuck" if stats["stuck"] and await state.aget("movement_target") else ("💤 Idle" if stats["speed"] < 0.1 else "🏃 Moving")
+    return f"""📈 Movement over the last {stats['elapsed']:.0f}s ({stats['samples']} samples):
+• Status: {status}
+• Position: ({last[1]:.1f}, {last[2]:.1f}, {last[3]:.1f}) yaw {last[4]:.0f}° pitch {last[5]:.0f}°
+• Distance travelled: {stats['distance']:.1f} blocks (net {stats['displacement']:.1f})
+• Speed: {stats['speed']:.2f} blocks/s average, {stats['max_speed']:.2f} peak
+• Path straightness: {stats['straightness']:.0%}"""
+
+@mcp.tool()
+async def get_movement_eta() -> str:
+    """Get remaining distance and ETA to the current move_bot/goto_waypoint target"""
+    start_background_tasks()
+    target = await state.aget("movement_target")
+    if not target:
+        return "🎯 No active movement target"
+    
+    samples = positions.window(time.time() - target["set_at"])
+    if len(samples) < 2:
+        return f"🎯 Heading to {target['label']}, waiting for position samples"
+    
+    eta = movement_eta(samples[-30:], target)
+    eta_text = f"{eta['eta']:.0f}s" if np.isfinite(eta["eta"]) else "unknown (not closing in)"
+    stuck_text = "\n⚠️ Bot looks stuck" if movement_stats(samples)["stuck"] else ""
+    return f"""🎯 Heading to {target['label']}:
+• Remaining: {eta['remaining']:.1f} blocks
+• Closing speed: {eta['closing_speed']:.2f} blocks/s
+• ETA: {eta_text}
+• Underway for: {time.time() - target['set_at']:.0f}s{stuck_text}"""
+
+@mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def explore_area(radius: int = 20) -> str:
     """Make bot explore the surrounding area within given radius"""
     result = await make_api_request("/movement/explore", "POST", {"radius": radius})
@@ -173,6 +2097,8 @@ async def explore_area(radius: int = 20) -> str:
         return f"❌ Exploration failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def return_to_spawn() -> str:
     """Make bot return to spawn point"""
     result = await make_api_request("/movement/spawn", "POST")
@@ -184,6 +2110,7 @@ async def return_to_spawn() -> str:
 
 # ============ COMMUNICATION ============
 @mcp.tool()
+@uses_resources("chat")
 async def bot_say(message: str) -> str:
     """Make the bot say something in chat"""
     result = await make_api_request("/chat/say", "POST", {"message": message})
@@ -194,6 +2121,7 @@ async def bot_say(message: str) -> str:
         return f"❌ Chat failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("chat")
 async def whisper_player(player_name: str, message: str) -> str:
     """Send a private message to a specific player"""
     result = await make_api_request("/chat/whisper", "POST", {
@@ -208,14 +2136,19 @@ async def whisper_player(player_name: str, message: str) -> str:
 
 @mcp.tool()
 async def get_nearby_players() -> str:
-    """Get list of nearby players"""
-    result = await make_api_request("/players/nearby")
-    
-    if not result.get("success"):
-        return f"❌ Failed to get nearby players: {result.get('error', 'Unknown error')}"
-    
-    data = result.get("data", {})
-    players = data.get("players", [])
+    """Get list of nearby players (from the local entity tracker when it is up to date)"""
+    start_background_tasks()
+    origin = await current_position() if entities.fresh() else None
+    if origin is not None:
+        players = entities.within(origin["x"], origin["y"], origin["z"], float("inf"), "player")
+    else:
+        result = await make_api_request("/players/nearby")
+        
+        if not result.get("success"):
+            return f"❌ Failed to get nearby players: {result.get('error', 'Unknown error')}"
+        
+        data = result.get("data", {})
+        players = data.get("players", [])
     
     if not players:
         return "👥 No players nearby"
@@ -229,6 +2162,7 @@ async def get_nearby_players() -> str:
 
 # ============ ACTIONS & ANIMATIONS ============
 @mcp.tool()
+@uses_resources("movement", "chat")
 async def bot_coucou() -> str:
     """Make bot say 'coucou' and crouch 3 times"""
     result = await make_api_request("/bot/action/coucou", "POST")
@@ -239,6 +2173,7 @@ async def bot_coucou() -> str:
         return f"❌ Coucou action failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
 async def bot_jump() -> str:
     """Make bot jump"""
     result = await make_api_request("/bot/action/jump", "POST")
@@ -249,6 +2184,7 @@ async def bot_jump() -> str:
         return f"❌ Jump action failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
 async def bot_dance() -> str:
     """Make bot perform a dance"""
     result = await make_api_request("/bot/action/dance", "POST")
@@ -259,6 +2195,7 @@ async def bot_dance() -> str:
         return f"❌ Dance action failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
 async def bot_look_around() -> str:
     """Make bot look around in all directions"""
     result = await make_api_request("/bot/action/lookAround", "POST")
@@ -269,6 +2206,7 @@ async def bot_look_around() -> str:
         return f"❌ Look around failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
 async def bot_wave() -> str:
     """Make bot wave at nearby players"""
     result = await make_api_request("/bot/action/wave", "POST")
@@ -279,6 +2217,7 @@ async def bot_wave() -> str:
         return f"❌ Wave action failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
 async def bot_sit() -> str:
     """Make bot sit down (crouch and stay)"""
     result = await make_api_request("/bot/action/sit", "POST")
@@ -289,6 +2228,7 @@ async def bot_sit() -> str:
         return f"❌ Sit action failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
 async def bot_stand() -> str:
     """Make bot stand up from sitting"""
     result = await make_api_request("/bot/action/stand", "POST")
@@ -300,6 +2240,8 @@ async def bot_stand() -> str:
 
 # ============ MINING & RESOURCES ============
 @mcp.tool()
+@uses_resources("movement", "inventory")
+@stops_on_cancel("/mining/stop")
 async def mine_block(block_type: str, max_distance: int = 32) -> str:
     """Mine a specific type of block"""
     result = await make_api_request("/mining/block", "POST", {
@@ -313,6 +2255,8 @@ async def mine_block(block_type: str, max_distance: int = 32) -> str:
         return f"❌ Mining failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
+@stops_on_cancel("/mining/stop")
 async def mine_vein(block_type: str, max_blocks: int = 64) -> str:
     """Mine an entire vein of a specific block type (e.g., coal, iron)"""
     result = await make_api_request("/mining/vein", "POST", {
@@ -326,6 +2270,8 @@ async def mine_vein(block_type: str, max_blocks: int = 64) -> str:
         return f"❌ Vein mining failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
+@stops_on_cancel("/movement/stop")
 async def collect_nearby_items(radius: int = 10) -> str:
     """Collect all dropped items within specified radius"""
     result = await make_api_request("/collection/items", "POST", {"radius": radius})
@@ -357,6 +2303,7 @@ async def find_nearest_block(block_type: str, max_distance: int = 32) -> str:
 
 # ============ CRAFTING & TOOLS ============
 @mcp.tool()
+@uses_resources("crafting_table", "inventory")
 async def craft_item(item_name: str, count: int = 1) -> str:
     """Craft a specific item"""
     result = await make_api_request("/crafting/item", "POST", {
@@ -370,6 +2317,7 @@ async def craft_item(item_name: str, count: int = 1) -> str:
         return f"❌ Crafting failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("crafting_table", "inventory")
 async def craft_tools() -> str:
     """Automatically craft basic tools (pickaxe, axe, shovel) if materials available"""
     result = await make_api_request("/crafting/tools", "POST")
@@ -380,17 +2328,85 @@ async def craft_tools() -> str:
         return f"❌ Tool crafting failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
-async def smelt_items(item_type: str, count: int = 64) -> str:
-    """Smelt items in a furnace (requires fuel)"""
-    result = await make_api_request("/crafting/smelt", "POST", {
-        "itemType": item_type,
-        "count": count
-    })
-    
-    if result.get("success"):
-        return f"🔥 {result.get('message', 'Smelting completed')}"
-    else:
+async def smelt_items(item_type: str, count: int = 64, radius: int = 16, fuel: str = "coal") -> str:
+    """Start a background smelting job spread over every furnace within radius; returns at once.
+
+    The bot loads the furnaces, then collects and refills each one as it finishes. Follow the job
+    with get_smelting_progress.
+    """
+    if count <= 0:
+        return "❌ Smelting failed: count must be positive"
+    result = await make_api_request("/crafting/furnaces", "POST", {"maxDistance": radius})
+    if not result.get("success"):
         return f"❌ Smelting failed: {result.get('error', 'Unknown error')}"
+    furnaces = result.get("data", {}).get("furnaces", [])
+    if not furnaces:
+        return f"❌ Smelting failed: no furnace within {radius} blocks"
+    usable = [f for f in furnaces if furnace_accepts(f.get("type", "furnace"), item_type)]
+    if not usable:
+        types = ", ".join(sorted({f.get("type", "furnace") for f in furnaces}))
+        return f"❌ Smelting failed: no furnace within {radius} blocks takes {item_type} (found {types})"
+    
+    job = await smelting.create(item_type, count, fuel, usable)
+    used = [f for f in job.furnaces if f["load"]]
+    smelt_text = f"🔥 Smelting job {job.id} started: {count}x {item_type} over {len(used)} furnace(s), fuel {fuel}\n"
+    for furnace in used:
+        smelt_text += f"• {furnace['type']} at ({furnace['x']}, {furnace['y']}, {furnace['z']}): {furnace['load']} items\n"
+    smelt_text += f"⏳ Estimated {job.eta() - time.time():.0f}s plus walking; check with get_smelting_progress(\"{job.id}\")"
+    return smelt_text
+
+@mcp.tool()
+async def get_smelting_progress(job_id: str = "") -> str:
+    """Get the progress of smelting jobs without waiting on them (all jobs when job_id is empty)"""
+    if job_id:
+        job = await smelting.get(job_id)
+        jobs = [job] if job is not None else []
+    else:
+        jobs = await smelting.all()
+    if not jobs:
+        return f"❌ Unknown smelting job {job_id}" if job_id else "🔥 No smelting jobs"
+    
+    now = time.time()
+    progress_text = ""
+    for job in jobs:
+        in_furnaces = sum(job.smelted(f, now) for f in job.furnaces)
+        orphaned = job.orphaned(now)
+        icon = "✅" if job.finished_at is not None and job.error is None else "⚠️" if job.finished_at is not None or orphaned else "🔥"
+        progress_text += f"{icon} {job.id}: {job.item} {job.collected} collected + ~{in_furnaces} smelted in furnaces / {job.count}"
+        if orphaned:
+            progress_text += f", orphaned: worker {job.owner} stopped updating it {_ago(job.heartbeat)}"
+        elif job.finished_at is None:
+            progress_text += f", ~{max(job.eta() - now, 0):.0f}s left"
+            progress_text += f", {job.pending} waiting for a free furnace" if job.pending else ""
+        progress_text += "\n"
+        if job.error:
+            progress_text += f"   ❌ {job.error}\n"
+        for furnace in job.furnaces:
+            status = furnace["status"]
+            if status == "smelting":
+                status += f" {job.smelted(furnace, now)}/{furnace['load']}, done in {max(furnace['finish_at'] - now, 0):.0f}s"
+            elif status == "failed":
+                status += f": {furnace.get('error')}"
+            elif status == "cancelled":
+                status += f", {furnace['load']} items left inside"
+            progress_text += f"   • {furnace['type']} ({furnace['x']}, {furnace['y']}, {furnace['z']}): {status}, {furnace['collected']} collected\n"
+    
+    return progress_text.strip()
+
+@mcp.tool()
+async def cancel_smelting_job(job_id: str) -> str:
+    """Cancel a smelting job: no more loading or collecting; items already in the furnaces stay there"""
+    job = await smelting.get(job_id)
+    if job is None:
+        return f"❌ Unknown smelting job {job_id}"
+    if job.finished_at is not None:
+        return f"ℹ️ Smelting job {job_id} already finished"
+    if job.orphaned(time.time()):
+        left = await smelting.abandon(job)
+        return (f"⚠️ Smelting job {job_id} was not running any more (worker {job.owner} stopped {_ago(job.heartbeat)}); "
+                f"marked it cancelled, {job.collected} items collected, {left} left in the furnaces")
+    await smelting.cancel(job_id)
+    return f"🛑 Cancelling smelting job {job_id}; {job.collected} items were collected so far"
 
 @mcp.tool()
 async def get_crafting_recipes(item_name: str) -> str:
@@ -440,6 +2456,7 @@ async def check_inventory() -> str:
     return inventory_text.strip()
 
 @mcp.tool()
+@uses_resources("inventory")
 async def organize_inventory() -> str:
     """Organize and sort inventory items"""
     result = await make_api_request("/inventory/organize", "POST")
@@ -450,6 +2467,7 @@ async def organize_inventory() -> str:
         return f"❌ Inventory organization failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("inventory")
 async def drop_item(item_name: str, count: int = 1) -> str:
     """Drop specific item from inventory"""
     result = await make_api_request("/inventory/drop", "POST", {
@@ -463,6 +2481,7 @@ async def drop_item(item_name: str, count: int = 1) -> str:
         return f"❌ Drop failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("inventory")
 async def equip_item(item_name: str) -> str:
     """Equip an item from inventory"""
     result = await make_api_request("/inventory/equip", "POST", {"itemName": item_name})
@@ -496,6 +2515,7 @@ async def check_storage(storage_type: str = "chest") -> str:
 
 # ============ BUILDING & CONSTRUCTION ============
 @mcp.tool()
+@uses_resources("movement", "inventory")
 async def place_block(x: int, y: int, z: int, block_type: str) -> str:
     """Place a specific block at given coordinates"""
     result = await make_api_request("/building/place", "POST", {
@@ -509,6 +2529,7 @@ async def place_block(x: int, y: int, z: int, block_type: str) -> str:
         return f"❌ Block placement failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
 async def build_structure(structure_type: str, size: int = 5) -> str:
     """Build a predefined structure (house, tower, bridge, etc.)"""
     result = await make_api_request("/building/structure", "POST", {
@@ -522,6 +2543,8 @@ async def build_structure(structure_type: str, size: int = 5) -> str:
         return f"❌ Structure building failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
+@stops_on_cancel("/mining/stop")
 async def clear_area(radius: int = 5, depth: int = 3) -> str:
     """Clear an area around the bot by removing blocks"""
     result = await make_api_request("/building/clear", "POST", {
@@ -535,6 +2558,7 @@ async def clear_area(radius: int = 5, depth: int = 3) -> str:
         return f"❌ Area clearing failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
 async def fill_area(x1: int, y1: int, z1: int, x2: int, y2: int, z2: int, block_type: str) -> str:
     """Fill an area between two coordinates with specified block type"""
     result = await make_api_request("/building/fill", "POST", {
@@ -550,29 +2574,108 @@ async def fill_area(x1: int, y1: int, z1: int, x2: int, y2: int, z2: int, block_
 
 # ============ FARMING ============
 @mcp.tool()
-async def plant_crops(crop_type: str, area_size: int = 5) -> str:
-    """Plant crops in a specified area"""
+@uses_resources("movement", "inventory")
+async def plant_crops(crop_type: str, area_size: int = 5, hydrated: bool = True) -> str:
+    """Plant crops in a specified area and track the plot for farm_schedule.
+
+    hydrated tells whether the farmland is next to water, which makes crops grow faster.
+    """
+    origin = await current_position()
     result = await make_api_request("/farming/plant", "POST", {
         "cropType": crop_type,
         "areaSize": area_size
     })
     
     if result.get("success"):
-        return f"🌱 {result.get('message', 'Crops planted')}"
+        plant_text = f"🌱 {result.get('message', 'Crops planted')}"
+        if not has_growth_model(crop_type):
+            plant_text += f"\n⚠️ No growth model for {crop_type}: the plot is not tracked for farm_schedule"
+        elif origin is not None:
+            plot = await crops.aplant(origin["x"], origin["y"], origin["z"], crop_type, area_size, hydrated)
+            plant_text += f"\n⏳ Expected mature in ~{(plot['mature_at'] - plot['planted_at']) / 60:.0f} min, ready for harvest in ~{(plot['ready_at'] - plot['planted_at']) / 60:.0f} min"
+        return plant_text
     else:
         return f"❌ Planting failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
-async def harvest_crops(radius: int = 10) -> str:
-    """Harvest mature crops in the area"""
-    result = await make_api_request("/farming/harvest", "POST", {"radius": radius})
+@uses_resources("movement", "inventory")
+@stops_on_cancel("/movement/stop")
+async def harvest_crops(radius: int = 10, scheduled: bool = False, ctx: Optional[Context] = None) -> str:
+    """Harvest mature crops in the area.
+
+    With scheduled=True, visit only the tracked plots predicted to be mature, in a short route
+    order, and harvest each one (radius is then taken from each plot's size).
+    """
+    if not scheduled:
+        result = await make_api_request("/farming/harvest", "POST", {"radius": radius})
+        
+        if result.get("success"):
+            return f"🌾 {result.get('message', 'Crops harvested')}"
+        else:
+            return f"❌ Harvesting failed: {result.get('error', 'Unknown error')}"
+    
+    due = await crops.aready()
+    if not due:
+        next_due = await crops.anext_due()
+        if next_due is None:
+            return "🌾 No tracked plots, plant with plant_crops first"
+        return f"🌾 Nothing mature yet, next plot due in {(next_due - time.time()) / 60:.0f} min"
+    
+    origin = await current_position()
+    route = visit_route(origin, due) if origin is not None else due
+    harvest_text = f"🌾 Scheduled Harvest ({len(route)} plots):\n"
+    for i, plot in enumerate(route):
+        label = f"{plot['crop']} at ({plot['x']}, {plot['y']}, {plot['z']})"
+        await set_movement_target(plot["x"], plot["y"], plot["z"], f"plot {label}")
+        moved = await make_api_request("/movement/moveTo", "POST", {"x": plot["x"], "y": plot["y"], "z": plot["z"]})
+        if not moved.get("success"):
+            await clear_movement_target()
+            harvest_text += f"❌ {label}: {moved.get('error', 'Unknown error')}\n"
+            continue
+        result = await make_api_request("/farming/harvest", "POST", {"radius": plot["size"] // 2 + 1})
+        if not result.get("success"):
+            harvest_text += f"❌ {label}: {result.get('error', 'Unknown error')}\n"
+        elif result.get("data", {}).get("harvested") == 0:
+            # Grew slower than predicted (dry farmland, unloaded chunks): check again later
+            await crops.apostpone(plot, 600)
+            harvest_text += f"⏳ {label}: nothing mature yet, postponed 10 min\n"
+        else:
+            await crops.aremove(plot)
+            harvest_text += f"✅ {label}: {result.get('message', 'harvested')}\n"
+        if ctx is not None:
+            await ctx.report_progress(i + 1, len(route))
     
-    if result.get("success"):
-        return f"🌾 {result.get('message', 'Crops harvested')}"
-    else:
-        return f"❌ Harvesting failed: {result.get('error', 'Unknown error')}"
+    return harvest_text.strip()
+
+@mcp.tool()
+async def farm_schedule(horizon_minutes: float = 60.0) -> str:
+    """List tracked plots ready to harvest, in route order, and those due within horizon_minutes"""
+    now = time.time()
+    due = await crops.aready(now)
+    upcoming = await crops.aupcoming(now + horizon_minutes * 60, now)
+    if not due and not upcoming and not await crops.acount():
+        return "🌾 No tracked plots, plant with plant_crops first"
+    
+    if due:
+        origin = await current_position()
+        if origin is not None:
+            due = visit_route(origin, due)
+    schedule_text = f"🌾 Farm Schedule ({await crops.acount()} plots tracked):\n"
+    schedule_text += f"✅ Ready now ({len(due)}):\n" if due else "✅ Nothing ready now\n"
+    for plot in due:
+        schedule_text += f"• {plot['crop']} at ({plot['x']}, {plot['y']}, {plot['z']}), size {plot['size']}, planted {(now - plot['planted_at']) / 60:.0f} min ago\n"
+    if upcoming:
+        schedule_text += f"⏳ Due within {horizon_minutes:g} min ({len(upcoming)}):\n"
+        for plot in upcoming:
+            schedule_text += f"• {plot['crop']} at ({plot['x']}, {plot['y']}, {plot['z']}) in {(plot['ready_at'] - now) / 60:.0f} min\n"
+    next_due = await crops.anext_due(now)
+    if next_due is not None:
+        schedule_text += f"🕒 Next due: {time.strftime('%H:%M', time.localtime(next_due))} (in {(next_due - now) / 60:.0f} min)"
+    
+    return schedule_text.strip()
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
 async def breed_animals(animal_type: str) -> str:
     """Breed nearby animals of the specified type"""
     result = await make_api_request("/farming/breed", "POST", {"animalType": animal_type})
@@ -584,6 +2687,7 @@ async def breed_animals(animal_type: str) -> str:
 
 # ============ QUEST SYSTEM ============
 @mcp.tool()
+@stops_on_cancel("/quest/stop")
 async def start_quest(quest_name: str) -> str:
     """Start a specific quest for autonomous bot behavior"""
     result = await make_api_request("/quest", "POST", {"questName": quest_name})
@@ -627,7 +2731,7 @@ async def get_quest_progress() -> str:
 @mcp.tool()
 async def stop_quest() -> str:
     """Stop the current quest"""
-    result = await make_api_request("/quest/stop", "POST")
+    result = await make_api_request("/quest/stop", "POST", gated=False)
     
     if result.get("success"):
         return f"🛑 {result.get('message', 'Quest stopped')}"
@@ -675,8 +2779,15 @@ async def create_custom_quest(quest_name: str, steps: List[str]) -> str:
 
 # ============ COMBAT & SURVIVAL ============
 @mcp.tool()
+@uses_resources("movement")
 async def attack_nearest_hostile() -> str:
-    """Attack the nearest hostile mob"""
+    """Attack the nearest hostile mob (skipped locally when the entity tracker sees none nearby)"""
+    start_background_tasks()
+    if entities.fresh():
+        origin = await current_position()
+        if origin is not None and entities.nearest(origin["x"], origin["y"], origin["z"], "hostile", 32) is None:
+            return "🕊️ No hostile mobs within 32 blocks"
+    
     result = await make_api_request("/combat/attack", "POST")
     
     if result.get("success"):
@@ -684,7 +2795,63 @@ async def attack_nearest_hostile() -> str:
     else:
         return f"❌ Attack failed: {result.get('error', 'Unknown error')}"
 
+async def _tracked_origin(x: Optional[float], y: Optional[float], z: Optional[float]) -> Optional[Dict[str, float]]:
+    """Query origin for entity tools, or None when the tracker has no recent data"""
+    start_background_tasks()
+    if not entities.fresh():
+        return None
+    return {"x": x, "y": y, "z": z} if None not in (x, y, z) else await current_position()
+
+@mcp.tool()
+async def nearest_hostile(max_distance: float = 32.0, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None) -> str:
+    """Find the nearest hostile mob from the local entity tracker (defaults to the bot's position)"""
+    origin = await _tracked_origin(x, y, z)
+    if origin is None:
+        return "❌ Entity tracker has no recent data from the bridge"
+    
+    mob = entities.nearest(origin["x"], origin["y"], origin["z"], "hostile", max_distance)
+    if mob is None:
+        return f"🕊️ No hostile mobs within {max_distance:g} blocks"
+    return f"⚠️ Nearest hostile: {mob['type']} at ({mob['x']:.1f}, {mob['y']:.1f}, {mob['z']:.1f}) - {mob['distance']:.1f} blocks"
+
+@mcp.tool()
+async def players_within(radius: float = 32.0, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None) -> str:
+    """List players within a radius from the local entity tracker (defaults to the bot's position)"""
+    origin = await _tracked_origin(x, y, z)
+    if origin is None:
+        return "❌ Entity tracker has no recent data from the bridge"
+    
+    players = entities.within(origin["x"], origin["y"], origin["z"], radius, "player")
+    if not players:
+        return f"👥 No players within {radius:g} blocks"
+    player_list = "\n".join(f"• {player['name']} - Distance: {player['distance']:.1f} blocks" for player in players)
+    return f"👥 Players within {radius:g} blocks ({len(players)}):\n{player_list}"
+
+@mcp.tool()
+async def threat_density(radius: float = 16.0, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None) -> str:
+    """Count hostile mobs around a point, with a distance-weighted threat score (defaults to the bot's position)"""
+    origin = await _tracked_origin(x, y, z)
+    if origin is None:
+        return "❌ Entity tracker has no recent data from the bridge"
+    
+    mobs = entities.within(origin["x"], origin["y"], origin["z"], radius, "hostile")
+    if not mobs:
+        return f"🟢 No hostile mobs within {radius:g} blocks"
+    
+    # Each mob counts 1 at point blank, fading linearly to 0 at the radius
+    score = sum(1 - mob["distance"] / radius for mob in mobs)
+    by_type: Dict[str, int] = defaultdict(int)
+    for mob in mobs:
+        by_type[mob["type"]] += 1
+    level = "🔴 High" if score >= 3 else "🟠 Medium" if score >= 1 else "🟡 Low"
+    type_list = ", ".join(f"{count}x {mob_type}" for mob_type, count in sorted(by_type.items(), key=lambda item: -item[1]))
+    return f"""{level} threat within {radius:g} blocks:
+• Hostiles: {len(mobs)} ({type_list})
+• Threat score: {score:.1f}
+• Closest: {mobs[0]['type']} at {mobs[0]['distance']:.1f} blocks"""
+
 @mcp.tool()
+@uses_resources("inventory")
 async def eat_food() -> str:
     """Eat food from inventory to restore hunger"""
     result = await make_api_request("/survival/eat", "POST")
@@ -695,6 +2862,8 @@ async def eat_food() -> str:
         return f"❌ Eating failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement", "inventory")
+@stops_on_cancel("/movement/stop")
 async def find_shelter() -> str:
     """Find or create shelter for nighttime/weather"""
     result = await make_api_request("/survival/shelter", "POST")
@@ -714,43 +2883,88 @@ async def set_waypoint(name: str, x: float, y: float, z: float) -> str:
     })
     
     if result.get("success"):
+        await waypoints.aupsert(name, x, y, z)
         return f"📍 {result.get('message', 'Waypoint set')}"
     else:
         return f"❌ Waypoint setting failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def goto_waypoint(name: str) -> str:
-    """Navigate to a previously set waypoint"""
-    result = await make_api_request("/navigation/goto", "POST", {"waypointName": name})
+    """Navigate to a previously set waypoint, resolved from the local waypoint store when possible"""
+    await sync_waypoints()
+    waypoint = await waypoints.aget(name)
+    if waypoint:
+        await set_movement_target(waypoint["x"], waypoint["y"], waypoint["z"], f"waypoint {name}")
+        result = await make_api_request("/movement/moveTo", "POST", {"x": waypoint["x"], "y": waypoint["y"], "z": waypoint["z"]})
+    else:
+        result = await make_api_request("/navigation/goto", "POST", {"waypointName": name})
     
     if result.get("success"):
+        pos = result.get("data", {}).get("position")
+        if pos and not waypoint:
+            await set_movement_target(pos.get("x", 0), pos.get("y", 0), pos.get("z", 0), f"waypoint {name}")
         return f"🧭 {result.get('message', 'Navigating to waypoint')}"
     else:
+        await clear_movement_target()
         return f"❌ Navigation failed: {result.get('error', 'Unknown error')}"
 
 @mcp.tool()
-async def list_waypoints() -> str:
-    """List all saved waypoints"""
-    result = await make_api_request("/navigation/waypoints")
-    
-    if not result.get("success"):
-        return f"❌ Failed to get waypoints: {result.get('error', 'Unknown error')}"
-    
-    data = result.get("data", {})
-    waypoints = data.get("waypoints", [])
-    
-    if not waypoints:
+async def list_waypoints(refresh: bool = False) -> str:
+    """List all saved waypoints (from the local store, refresh=True re-syncs with the bridge)"""
+    error = await sync_waypoints(force=refresh)
+    saved = await waypoints.aall()
+    
+    if error and not saved:
+        return f"❌ Failed to get waypoints: {error}"
+    if not saved:
         return "📍 No waypoints saved"
     
-    waypoint_text = "📍 Saved Waypoints:\n"
-    for waypoint in waypoints:
-        name = waypoint.get("name", "Unknown")
-        pos = waypoint.get("position", {})
-        waypoint_text += f"• {name}: ({pos.get('x', 0):.1f}, {pos.get('y', 0):.1f}, {pos.get('z', 0):.1f})\n"
+    waypoint_text = f"📍 Saved Waypoints ({len(saved)}):\n"
+    for waypoint in saved[:50]:  # Limit output for large mapping sets
+        waypoint_text += f"• {waypoint['name']}: ({waypoint['x']:.1f}, {waypoint['y']:.1f}, {waypoint['z']:.1f})\n"
+    
+    if len(saved) > 50:
+        waypoint_text += f"... and {len(saved) - 50} more, use nearest_waypoints/waypoints_within"
     
     return waypoint_text.strip()
 
+def _format_waypoint_hits(title: str, hits: List[Dict[str, Any]]) -> str:
+    hits_text = f"{title}:\n"
+    for waypoint in hits:
+        hits_text += f"• {waypoint['name']}: ({waypoint['x']:.1f}, {waypoint['y']:.1f}, {waypoint['z']:.1f}) - {waypoint['distance']:.1f} blocks\n"
+    return hits_text.strip()
+
+@mcp.tool()
+async def nearest_waypoints(k: int = 5, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None) -> str:
+    """Find the k saved waypoints nearest to a point (defaults to the bot's position)"""
+    await sync_waypoints()
+    origin = {"x": x, "y": y, "z": z} if None not in (x, y, z) else await current_position()
+    if origin is None:
+        return "❌ Nearest waypoint search failed: bot position unknown, pass x, y, z"
+    
+    hits = await waypoints.anearest(origin["x"], origin["y"], origin["z"], k)
+    if not hits:
+        return "📍 No waypoints saved"
+    return _format_waypoint_hits(f"📍 {len(hits)} nearest waypoints to ({origin['x']:.1f}, {origin['y']:.1f}, {origin['z']:.1f})", hits)
+
+@mcp.tool()
+async def waypoints_within(radius: float, x: Optional[float] = None, y: Optional[float] = None, z: Optional[float] = None) -> str:
+    """List saved waypoints within a radius of a point (defaults to the bot's position)"""
+    await sync_waypoints()
+    origin = {"x": x, "y": y, "z": z} if None not in (x, y, z) else await current_position()
+    if origin is None:
+        return "❌ Waypoint search failed: bot position unknown, pass x, y, z"
+    
+    hits = await waypoints.awithin(origin["x"], origin["y"], origin["z"], radius)
+    if not hits:
+        return f"📍 No waypoints within {radius:g} blocks"
+    return _format_waypoint_hits(f"📍 {len(hits)} waypoints within {radius:g} blocks", hits[:50])
+
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def patrol_area(waypoints: List[str], cycles: int = 1) -> str:
     """Patrol between multiple waypoints"""
     result = await make_api_request("/navigation/patrol", "POST", {
@@ -763,48 +2977,142 @@ async def patrol_area(waypoints: List[str], cycles: int = 1) -> str:
     else:
         return f"❌ Patrol failed: {result.get('error', 'Unknown error')}"
 
+def scan_tiles(x: float, z: float, radius: int, tile_size: int) -> List[Dict[str, float]]:
+    """Square tiles covering the scan disc, nearest first"""
+    tiles = []
+    steps = math.ceil(radius / tile_size)
+    for i in range(-steps, steps):
+        for j in range(-steps, steps):
+            min_x, min_z = x + i * tile_size, z + j * tile_size
+            # Distance from the scan centre to the closest point of the tile
+            dx = max(min_x - x, 0, x - (min_x + tile_size))
+            dz = max(min_z - z, 0, z - (min_z + tile_size))
+            if math.hypot(dx, dz) <= radius:
+                tiles.append({"minX": min_x, "maxX": min_x + tile_size, "minZ": min_z, "maxZ": min_z + tile_size,
+                              "distance": math.hypot(dx, dz)})
+    return sorted(tiles, key=lambda tile: tile["distance"])
+
+def _scan_matches(item: Dict[str, Any], types: List[str]) -> bool:
+    return not types or any(wanted in item.get("type", "") for wanted in types)
+
+def _outside_tile(item: Dict[str, Any], tile: Dict[str, float]) -> bool:
+    """Whether an item lies clearly outside the tile it was returned for (a bridge ignoring bounds)"""
+    pos = item.get("position", {})
+    x, z = pos.get("x", 0), pos.get("z", 0)
+    return x < tile["minX"] - 1 or x > tile["maxX"] + 1 or z < tile["minZ"] - 1 or z > tile["maxZ"] + 1
+
 @mcp.tool()
-async def scan_environment() -> str:
-    """Scan the surrounding environment for resources, mobs, and structures"""
-    result = await make_api_request("/scanner/environment", "POST")
-    
-    if not result.get("success"):
-        return f"❌ Environment scan failed: {result.get('error', 'Unknown error')}"
-    
-    data = result.get("data", {})
-    
-    scan_text = "🔍 Environment Scan Results:\n"
+async def scan_environment(radius: int = 32, types: str = "", tile_size: int = 16, max_results: int = 0,
+                           ctx: Optional[Context] = None) -> str:
+    """Scan the surroundings for resources, mobs and structures, tile by tile from near to far.
+
+    types is a comma-separated filter (e.g. "iron_ore,log,zombie"); max_results > 0 stops the scan
+    early once that many matches are found.
+    """
+    wanted = [t.strip() for t in types.split(",") if t.strip()]
+    origin = await current_position()
+    if origin is None:
+        tiles = [None]  # position unknown: one untiled scan
+    else:
+        tiles = scan_tiles(origin["x"], origin["z"], radius, max(tile_size, 1))
+    
+    found: Dict[str, Dict[tuple, Dict[str, Any]]] = {"resources": {}, "mobs": {}, "structures": {}}
+    failures = []
+    scanned = 0
+    
+    async def fetch(tile: Optional[Dict[str, float]]) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"radius": radius, "types": wanted}
+        if tile is not None:
+            body["bounds"] = {key: tile[key] for key in ("minX", "maxX", "minZ", "maxZ")}
+        return await make_api_request("/scanner/environment", "POST", body)
+    
+    # The first tile goes alone so a bridge that cannot scan, or ignores bounds, costs one request.
+    # After that a window of tiles is in flight, merged strictly in near-to-far order.
+    pending = [(tiles[0], asyncio.ensure_future(fetch(tiles[0])))]
+    next_tile = 1
+    untiled = origin is None
+    try:
+        while pending:
+            tile, request = pending.pop(0)
+            result = await request
+            scanned += 1
+            if not result.get("success"):
+                failures.append(result.get("error", "Unknown error"))
+                if scanned == 1:
+                    break
+            else:
+                data = result.get("data", {})
+                if tile is not None and any(_outside_tile(item, tile) for category in found for item in data.get(category, [])):
+                    # The bridge scanned everything around the bot: this answer already covers the disc
+                    untiled = True
+                    for _, task in pending:
+                        task.cancel()
+                    pending = []
+                for category, items in found.items():
+                    for item in data.get(category, []):
+                        pos = item.get("position", {})
+                        # Corner tiles stick out of the scan disc
+                        outside = origin is not None and math.hypot(pos.get("x", 0) - origin["x"], pos.get("z", 0) - origin["z"]) > radius
+                        if _scan_matches(item, wanted) and not outside:
+                            items[(item.get("type"), pos.get("x"), pos.get("y"), pos.get("z"))] = item
+            while not untiled and len(pending) < SCAN_CONCURRENCY and next_tile < len(tiles):
+                pending.append((tiles[next_tile], asyncio.ensure_future(fetch(tiles[next_tile]))))
+                next_tile += 1
+            if ctx is not None:
+                await ctx.report_progress(scanned, scanned if untiled else len(tiles))
+            if max_results and sum(len(items) for items in found.values()) >= max_results:
+                break
+    finally:
+        for _, task in pending:
+            task.cancel()
+    
+    if failures and scanned == len(failures):
+        return f"❌ Environment scan failed: {failures[0]}"
+    
+    def by_distance(item: Dict[str, Any]) -> float:
+        if origin is None:
+            return item.get("distance", 0)
+        pos = item.get("position", {})
+        return math.dist((origin["x"], origin["y"], origin["z"]), (pos.get("x", 0), pos.get("y", 0), pos.get("z", 0)))
+    
+    coverage = f"{scanned}/{len(tiles)} tiles" if not untiled else "untiled"
+    scan_text = f"🔍 Environment Scan Results (radius {radius}, {coverage}{', filter: ' + ', '.join(wanted) if wanted else ''}):\n"
+    limit = max(max_results, 10)
     
     # Resources
-    resources = data.get("resources", [])
+    resources = sorted(found["resources"].values(), key=by_distance)
     if resources:
         scan_text += f"💎 Resources Found ({len(resources)}):\n"
-        for resource in resources[:10]:  # Limit to 10 items
+        for resource in resources[:limit]:
             pos = resource.get("position", {})
-            scan_text += f"• {resource.get('type', 'Unknown')} at ({pos.get('x', 0)}, {pos.get('y', 0)}, {pos.get('z', 0)})\n"
+            scan_text += f"• {resource.get('type', 'Unknown')} at ({pos.get('x', 0)}, {pos.get('y', 0)}, {pos.get('z', 0)}) - {by_distance(resource):.1f}m\n"
     
     # Mobs
-    mobs = data.get("mobs", [])
+    mobs = sorted(found["mobs"].values(), key=by_distance)
     if mobs:
         scan_text += f"🐺 Mobs Found ({len(mobs)}):\n"
-        for mob in mobs[:5]:  # Limit to 5 mobs
+        for mob in mobs[:limit]:
             pos = mob.get("position", {})
-            scan_text += f"• {mob.get('type', 'Unknown')} at ({pos.get('x', 0)}, {pos.get('y', 0)}, {pos.get('z', 0)}) - {mob.get('distance', 0):.1f}m\n"
+            scan_text += f"• {mob.get('type', 'Unknown')} at ({pos.get('x', 0)}, {pos.get('y', 0)}, {pos.get('z', 0)}) - {by_distance(mob):.1f}m\n"
     
     # Structures
-    structures = data.get("structures", [])
+    structures = sorted(found["structures"].values(), key=by_distance)
     if structures:
         scan_text += f"🏠 Structures Found ({len(structures)}):\n"
-        for structure in structures[:5]:  # Limit to 5 structures
+        for structure in structures[:limit]:
             pos = structure.get("position", {})
-            scan_text += f"• {structure.get('type', 'Unknown')} at ({pos.get('x', 0)}, {pos.get('y', 0)}, {pos.get('z', 0)})\n"
+            scan_text += f"• {structure.get('type', 'Unknown')} at ({pos.get('x', 0)}, {pos.get('y', 0)}, {pos.get('z', 0)}) - {by_distance(structure):.1f}m\n"
     
     if not resources and not mobs and not structures:
-        scan_text += "• Nothing of interest found in the immediate area"
+        scan_text += "• Nothing of interest found in the scanned area\n"
+    if failures:
+        scan_text += f"⚠️ {len(failures)} tiles failed: {failures[0]}"
     
     return scan_text.strip()
 
 @mcp.tool()
+@uses_resources("movement")
+@stops_on_cancel("/movement/stop")
 async def emergency_recall() -> str:
     """Emergency teleport to a safe location (spawn or set home)"""
     result = await make_api_request("/emergency/recall", "POST")
@@ -889,11 +3197,15 @@ async def get_command_info() -> str:
 • follow_player(name, distance) - Follow a player at set distance
 • stop_movement() - Stop all movement
 • get_position() - Get current position and orientation
+• get_movement_stats(window) - Speed, distance travelled, stuck detection
+• get_movement_eta() - Remaining distance and ETA to the current target
 • explore_area(radius) - Explore surrounding area
 • return_to_spawn() - Return to spawn point
 • set_waypoint(name, x, y, z) - Set named waypoint
 • goto_waypoint(name) - Navigate to waypoint
 • list_waypoints() - Show all saved waypoints
+• nearest_waypoints(k, x, y, z) - Closest saved waypoints
+• waypoints_within(radius, x, y, z) - Saved waypoints in range
 • patrol_area(waypoints, cycles) - Patrol between waypoints
 
 💬 Communication:
@@ -918,7 +3230,9 @@ async def get_command_info() -> str:
 🔨 Crafting & Tools:
 • craft_item(item, count) - Craft items from materials
 • craft_tools() - Auto-craft basic tool set
-• smelt_items(type, count) - Smelt ores in furnace
+• smelt_items(type, count, radius, fuel) - Background smelting over all nearby furnaces
+• get_smelting_progress(job_id) - Non-blocking progress of smelting jobs
+• cancel_smelting_job(job_id) - Stop a smelting job, leaving loaded items in the furnaces
 • get_crafting_recipes(item) - Show recipes
 
 📦 Inventory Management:
@@ -935,12 +3249,16 @@ async def get_command_info() -> str:
 • fill_area(x1, y1, z1, x2, y2, z2, block) - Fill regions
 
 🌾 Farming:
-• plant_crops(type, size) - Plant crop fields
-• harvest_crops(radius) - Harvest mature crops
+• plant_crops(type, size, hydrated) - Plant crop fields and track their growth
+• harvest_crops(radius, scheduled) - Harvest mature crops; scheduled visits only plots predicted mature
+• farm_schedule(horizon_minutes) - Plots ready now in route order and the next due time
 • breed_animals(type) - Breed farm animals
 
 ⚔️ Combat & Survival:
 • attack_nearest_hostile() - Fight hostile mobs
+• nearest_hostile(max_distance) - Closest hostile mob, answered locally
+• players_within(radius) - Players in range, answered locally
+• threat_density(radius) - Hostile count and threat score around the bot
 • eat_food() - Consume food for hunger
 • find_shelter() - Create/find shelter
 
@@ -953,7 +3271,7 @@ async def get_command_info() -> str:
 • create_custom_quest(name, steps) - Create custom quests
 
 🔍 Advanced Features:
-• scan_environment() - Detailed area scan
+• scan_environment(radius, types, tile_size, max_results) - Tiled area scan, nearest first, with early stop
 • emergency_recall() - Emergency teleport to safety
 • check_api_health() - Verify system status
 • get_bot_status() - Complete bot information
@@ -961,6 +3279,10 @@ async def get_command_info() -> str:
 🏥 System:
 • get_bot_status() - Full bot status including health, position
 • check_api_health() - Verify API connectivity
+• get_transport_stats() - Bytes on wire and decode time per endpoint
+• get_lock_metrics() - Lock contention on movement, inventory, crafting table and chat
+• get_admission_stats() - Adaptive in-flight limit and shed calls toward the bridge
+• get_tool_calls() - Long-running calls in flight; cancelled calls stop the bot
 
 💡 Pro Tips:
 • Use autonomous mode for hands-free gameplay
@@ -1014,6 +3336,28 @@ async def get_block_info() -> str:
 • Some blocks require specific tools to mine efficiently
 • Check tool durability before major mining operations"""
 
+def create_worker_app():
+    """ASGI app for one worker process in multi-worker mode (uvicorn factory).
+
+    Workers run stateless streamable HTTP behind one socket, so there is no session affinity:
+    consecutive requests of a session may reach different workers. Liveness, leases, resource
+    locks, the movement target, entity and position mirrors and smelting jobs are shared through
+    the `state` backend. Per worker, and so limited with MCP_WORKERS > 1:
+    - MCP cancel notifications arrive as a request of their own and never reach the in-flight
+      call, so cancelling a tool does not stop the bot; use the stop tools instead.
+    - get_tool_calls, get_transport_stats and get_admission_stats describe the answering worker only.
+    - /admin/profile profiles only the worker that received the request.
+    """
+    return mcp.http_app(stateless_http=True)
+
 if __name__ == "__main__":
-    # Run the MCP server
-    mcp.run()
\ No newline at end of file
+    if MCP_WORKERS > 1:
+        if MCP_STATE_BACKEND == "memory":
+            raise SystemExit("MCP_WORKERS > 1 needs a shared MCP_STATE_BACKEND (sqlite)")
+        import uvicorn
+        logger.warning("Running %d stateless workers: cancel notifications cannot stop in-flight tool calls, "
+                       "and call, transport and admission stats are per worker", MCP_WORKERS)
+        uvicorn.run("main:create_worker_app", factory=True, host=MCP_HOST, port=MCP_PORT, workers=MCP_WORKERS)
+    else:
+        # Run the MCP server
+        mcp.run()
\ No newline at end of file
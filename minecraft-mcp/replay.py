@@ -0,0 +1,138 @@
+# mcp-server/replay.py - Replay traffic recorded with BOT_API_RECORD
+#
+#   python replay.py serve traffic.jsonl --port 3901 --speed 1
+#       Stub bridge answering with the recorded responses and latencies.
+#
+#   python replay.py drive traffic.jsonl --base http://localhost:3901 --speed 4
+#       Re-issues the recorded calls through main.make_api_request with the
+#       original arrival pattern, then prints latency percentiles.
+#
+# Several logs (one per worker with MCP_WORKERS > 1) are merged by timestamp.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Dict, Any, Optional, List, Tuple
+
+from aiohttp import web
+
+def load_log(paths: List[str]) -> List[Dict[str, Any]]:
+    """Read and merge traffic logs (one per worker in multi-worker mode), skipping truncated lines"""
+    entries = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    entries.sort(key=lambda entry: entry.get("ts", 0))
+    return entries
+
+class ReplayStub:
+    """Serves recorded responses per (method, endpoint), in recorded order, looping when exhausted"""
+
+    def __init__(self, entries: List[Dict[str, Any]], speed: float = 1.0):
+        self.speed = speed
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._cursors: Dict[Tuple[str, str], deque] = {}
+        for entry in entries:
+            self._entries[(entry.get("method", "GET"), entry.get("endpoint", "/"))].append(entry)
+
+    def _next(self, key: Tuple[str, str], body: Any) -> Optional[Dict[str, Any]]:
+        recorded = self._entries.get(key)
+        if not recorded:
+            return None
+        cursor = self._cursors.get(key)
+        if not cursor:
+            cursor = self._cursors[key] = deque(recorded)
+        # Prefer the next entry sent with the same body so parametrised calls get their own answers
+        for i, entry in enumerate(cursor):
+            if entry.get("body") == body:
+                del cursor[i]
+                return entry
+        return cursor.popleft()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = None
+        if request.can_read_body:
+            try:
+                body = await request.json()
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                body = None
+        entry = self._next((request.method, request.path_qs), body)
+        if entry is None:
+            return web.json_response({"success": False, "error": f"No recording for {request.method} {request.path_qs}"}, status=404)
+        if self.speed > 0:
+            await asyncio.sleep(entry.get("latency_ms", 0) / 1000 / self.speed)
+        return web.json_response(entry.get("response"), status=entry.get("status") or 502)
+
+async def drive(entries: List[Dict[str, Any]], base: str, speed: float) -> None:
+    os.environ["BOT_API_BASE"] = base
+    os.environ.pop("BOT_API_RECORD", None)
+    # Only the bridge client is needed: keep main's stores in memory so nothing is written to disk
+    os.environ.update(MCP_STATE_BACKEND="memory", WAYPOINT_DB=":memory:", FARM_DB=":memory:")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+    main.BOT_API_BASE = base
+
+    latencies: List[float] = []
+    failures = 0
+    origin = entries[0]["ts"]
+    start = time.perf_counter()
+
+    async def fire(entry: Dict[str, Any]) -> None:
+        nonlocal failures
+        delay = (entry["ts"] - origin) / speed - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        result = await main.make_api_request(entry["endpoint"], entry.get("method", "GET"), entry.get("body"), gated=False)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        if not result.get("success"):
+            failures += 1
+
+    await asyncio.gather(*(fire(entry) for entry in entries))
+    elapsed = time.perf_counter() - start
+    await main.close_session()
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    print(f"📼 Replayed {len(entries)} calls in {elapsed:.1f}s ({len(entries) / elapsed:.1f} req/s), {failures} failed")
+    print(f"⏱️ Latency ms: p50={pct(0.50):.1f} p95={pct(0.95):.1f} p99={pct(0.99):.1f} max={latencies[-1]:.1f}")
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded bridge traffic")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = sub.add_parser("serve", help="Serve recorded responses as a stub bridge")
+    serve_cmd.add_argument("log", nargs="+")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=3901)
+    serve_cmd.add_argument("--speed", type=float, default=1.0, help="Latency divisor, 0 answers immediately")
+
+    drive_cmd = sub.add_parser("drive", help="Re-issue recorded calls with the original arrival pattern")
+    drive_cmd.add_argument("log", nargs="+")
+    drive_cmd.add_argument("--base", default="http://127.0.0.1:3901")
+    drive_cmd.add_argument("--speed", type=float, default=1.0, help="Arrival-time divisor")
+
+    args = parser.parse_args()
+    entries = load_log(args.log)
+    if not entries:
+        parser.error(f"No entries in {', '.join(args.log)}")
+
+    if args.command == "serve":
+        stub = ReplayStub(entries, args.speed)
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", stub.handle)
+        web.run_app(app, host=args.host, port=args.port)
+    else:
+        asyncio.run(drive(entries, args.base, max(args.speed, 1e-6)))
+
+if __name__ == "__main__":
+    main_cli()